@@ -0,0 +1,184 @@
+"""
+Benchmarks of each stage of the pipeline on synthetic data (see synthetic.py).
+
+For every size of data set, a portal-format csv is generated and run through
+munging (streamed in chunks, like init_master_dict), each predictor's preprocessing, prediction and evaluation.
+Each stage reports wall time and throughput from an untraced run.
+Peak memory comes from a second run of the stage under tracemalloc, which slows it down several times over,
+so that the timings aren't distorted by tracing. Pass --no-memory to skip the second run.
+
+Run from the chi-learn directory with, for example:
+    python -m clearn.benchmark --rows 10000 100000 1000000 --output benchmark.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from clearn import evaluate
+from clearn import instrument
+from clearn import munge
+from clearn import predict
+from clearn import synthetic
+
+PREDICTORS = [predict.BaselinePredictor, predict.NonsequentialPredictor, predict.SequentialPredictor]
+
+
+def run_benchmarks(row_counts, num_days=30, areas=None, start=datetime.date(2001, 1, 1),
+                   end=datetime.date(2015, 3, 1), crime_mix=None, random_state=0, report=None,
+                   chunksize=munge.CHUNK_SIZE, trace_memory=True):
+    """
+    :param row_counts: list of numbers of crimes to generate, one data set for each
+    :param num_days: number of days to predict and evaluate in each community area
+    :param report: function called with each stage's result as soon as it's measured
+    :param chunksize: number of records make_master_dict streams at a time, or None to read the whole csv at once
+    :param trace_memory: if True, run every stage a second time to trace its peak memory
+    :return: list of dicts with each stage's results
+    """
+    results = []
+
+    def record(result):
+        results.append(result)
+        if report is not None:
+            report(result)
+
+    for num_rows in row_counts:
+        csv_file, csv_path = tempfile.mkstemp(suffix='.csv')
+        os.close(csv_file)
+        try:
+            # Generating the csv isn't part of the pipeline, so its memory isn't traced
+            record(measure('generate', num_rows, num_rows, False, synthetic.write_crimes_csv, csv_path, num_rows,
+                           areas=areas, start=start, end=end, crime_mix=crime_mix, random_state=random_state)[0])
+            result, master_dict = measure('make_master_dict', num_rows, num_rows, trace_memory,
+                                          munge.make_master_dict, csv_path, chunksize=chunksize)
+            record(result)
+        finally:
+            os.remove(csv_path)
+
+        days_to_predict = pick_days(master_dict, num_days, random_state)
+        for predictor in PREDICTORS:
+            record_predictor_stages(record, num_rows, master_dict, predictor, days_to_predict, trace_memory)
+        record_parallel_vote_stages(record, num_rows, master_dict, days_to_predict)
+
+    return results
+
+
+def record_predictor_stages(record, num_rows, master_dict, predictor, days_to_predict, trace_memory=True):
+    name = predictor.__name__
+    result, time_series_dict = measure(name + '.preprocess', num_rows, len(master_dict), trace_memory,
+                                       predictor.preprocess, master_dict)
+    record(result)
+
+    area = sorted(time_series_dict)[0]
+    # A fresh predictor for each run, so the memory run doesn't start from the timed run's fits
+    record(measure(name + '.predict_many', num_rows, len(days_to_predict), trace_memory,
+                   lambda: predictor(time_series_dict[area]).predict_many(days_to_predict))[0])
+
+    num_predictions = len(days_to_predict) * len(time_series_dict)
+    record(measure(name + '.get_predictor_accuracy', num_rows, num_predictions, trace_memory,
+                   evaluate.get_predictor_accuracy, master_dict, days_to_predict, predictor)[0])
+
+
+def record_parallel_vote_stages(record, num_rows, master_dict, days_to_predict):
+    """
+    Times SequentialPredictor.predict_all without a vote cache with its HMM restarts trained one at a time,
+    then on a pool of every CPU, to show what n_jobs buys on this machine
+    """
+    time_series_dict = predict.SequentialPredictor.preprocess(master_dict)
+    num_predictions = len(days_to_predict) * len(time_series_dict)
+    for n_jobs in sorted({1, os.cpu_count() or 1}):
+        record(measure('SequentialPredictor.predict_all.n_jobs={}'.format(n_jobs), num_rows, num_predictions, False,
+                       predict.SequentialPredictor.predict_all, time_series_dict, days_to_predict, vote_cache=None,
+                       random_state=predict.HMM_RANDOM_STATE, n_jobs=n_jobs)[0])
+
+
+def measure(stage, num_rows, num_items, trace_memory, function, *args, **kwargs):
+    """
+    Calls function with args and kwargs, measuring how long it takes.
+    If trace_memory is True, calls it again under tracemalloc to measure the most memory it allocates at once.
+    Tracing slows down every allocation, so the two are never measured in the same run.
+
+    :param num_items: number of things (rows, areas, predictions...) the stage processes, for its throughput
+    :return: tuple of (dict of measurements, whatever the timed call of function returned)
+    """
+    started = time.perf_counter()
+    returned = function(*args, **kwargs)
+    seconds = time.perf_counter() - started
+
+    peak_traced = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            function(*args, **kwargs)
+            _, peak_traced = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    result = {
+        'stage': stage,
+        'rows': num_rows,
+        'items': num_items,
+        'seconds': seconds,
+        'items_per_second': num_items / seconds if seconds > 0 else None,
+        # Peak of memory allocated during the stage (as traced by Python), or None if it wasn't traced
+        'peak_traced_mb': peak_traced / 2**20 if peak_traced is not None else None,
+        # Peak resident memory of the whole process so far
+        'max_rss_mb': instrument.get_max_rss_mb()
+    }
+    return result, returned
+
+
+def pick_days(master_dict, num_days, random_state=None):
+    """
+    :return: sorted list of num_days days that every predictor can be evaluated on
+    """
+    index = master_dict['Chicago'].index
+    # Evaluation starts in 2005, and the nonsequential predictor needs a month of history besides
+    first_day = max(datetime.date(2005, 1, 1), (index[0] + datetime.timedelta(days=62)).date())
+    last_day = (index[-1] - datetime.timedelta(days=1)).date()
+    all_days = evaluate.get_all_days(first_day, last_day)
+    return sorted(random.Random(random_state).sample(all_days, min(num_days, len(all_days))))
+
+
+def format_result(result):
+    peak = '{:.1f}'.format(result['peak_traced_mb']) if result['peak_traced_mb'] is not None else '-'
+    return '{stage:<45} {rows:>10} rows {seconds:>10.3f} s {rate:>14} items/s {peak:>9} MB peak ' \
+           '{max_rss_mb:>9.1f} MB max RSS'.format(rate='{:.1f}'.format(result['items_per_second'] or 0), peak=peak,
+                                                  **result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark chi-learn on synthetic crime data.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                        help='numbers of crimes to generate, one benchmark for each')
+    parser.add_argument('--days', type=int, default=30, help='days to predict in each community area')
+    parser.add_argument('--areas', type=int, nargs='+', default=None, help='community area numbers to use')
+    parser.add_argument('--start', default='2001-01-01', help='first day of crimes (YYYY-MM-DD)')
+    parser.add_argument('--end', default='2015-03-01', help='last day of crimes (YYYY-MM-DD)')
+    parser.add_argument('--mix', default=None,
+                        help='json object mapping primary types to relative frequencies')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--chunksize', type=int, default=munge.CHUNK_SIZE,
+                        help='number of records to stream from the csv at a time when munging')
+    parser.add_argument('--no-memory', dest='trace_memory', action='store_false',
+                        help="don't run each stage a second time to trace its peak memory")
+    parser.add_argument('--output', default=None, help='path to write results to as json')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.rows, num_days=args.days, areas=args.areas,
+                             start=datetime.datetime.strptime(args.start, '%Y-%m-%d').date(),
+                             end=datetime.datetime.strptime(args.end, '%Y-%m-%d').date(),
+                             crime_mix=json.loads(args.mix) if args.mix else None, random_state=args.seed,
+                             report=lambda result: print(format_result(result)), chunksize=args.chunksize,
+                             trace_memory=args.trace_memory)
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
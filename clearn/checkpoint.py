@@ -0,0 +1,94 @@
+"""
+Append-only logs of evaluation outcomes, so that a long evaluation can pick up where it left off.
+
+Each log holds one line of json per (community area, day) with what a predictor predicted and what actually happened.
+A log belongs to one version of the data (see store.get_data_version) and one predictor configuration,
+and its filename is a hash of both. Rerunning the same evaluation reads the log back and only predicts missing days.
+"""
+import hashlib
+import json
+import os
+from clearn import clearn_path
+from clearn import store
+
+LOG_DIRECTORY = clearn_path('data/evaluation_logs')
+
+
+def open_log(master_dict, predictor_to_use, predictor_options=None, directory=LOG_DIRECTORY):
+    """
+    :return: the ResultLog for evaluating predictor_to_use with predictor_options on the data in master_dict
+    """
+    key = get_log_key(store.get_data_version(master_dict), predictor_to_use, predictor_options)
+    return ResultLog(os.path.join(directory, key + '.jsonl'))
+
+
+def get_log_key(data_version, predictor_to_use, predictor_options=None):
+    configuration = {
+        'data': data_version,
+        'predictor': predictor_to_use.__module__ + '.' + predictor_to_use.__name__,
+        # Options can hold objects like sklearn models. Their repr stands in for their settings.
+        'options': predictor_options or {}
+    }
+    serialized = json.dumps(configuration, sort_keys=True, default=repr)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+class ResultLog():
+    """
+    Outcomes already recorded at path, plus a way to record more.
+    Outcomes are appended and flushed to disk as soon as they're recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Maps (area, 'YYYY-MM-DD') to a tuple of (predicted, actual)
+        self.outcomes = {}
+        # False if the last line in the file was cut off before its newline, so the next record starts a fresh line
+        self.ends_with_newline = True
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as log_file:
+            for line in log_file:
+                self.ends_with_newline = line.endswith('\n')
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line is cut off if a run died while writing it. Its days get predicted again.
+                    continue
+                self.outcomes[(record['area'], record['day'])] = (record['predicted'], record['actual'])
+
+    def get_missing_days(self, area, days):
+        """
+        :return: list of the days in days that have no outcome recorded for area
+        """
+        return [day for day in days if (area, format_day(day)) not in self.outcomes]
+
+    def record(self, area, days, predicted_results, actual_results):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        lines = [] if self.ends_with_newline else ['\n']
+        for day, predicted, actual in zip(days, predicted_results, actual_results):
+            self.outcomes[(area, format_day(day))] = (bool(predicted), bool(actual))
+            lines.append(json.dumps({'area': area, 'day': format_day(day),
+                                     'predicted': bool(predicted), 'actual': bool(actual)}) + '\n')
+        with open(self.path, 'a') as log_file:
+            log_file.writelines(lines)
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        self.ends_with_newline = True
+
+    def get_outcomes(self, area, days):
+        """
+        :return: tuple of (predicted results, actual results) recorded for area on each day in days
+        """
+        outcomes = [self.outcomes[(area, format_day(day))] for day in days]
+        return [predicted for predicted, _ in outcomes], [actual for _, actual in outcomes]
+
+
+def format_day(day):
+    return day.strftime('%Y-%m-%d')
@@ -0,0 +1,50 @@
+from clearn import checkpoint
+from clearn.predict import BaselinePredictor
+from clearn.predict import SequentialPredictor
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestResultLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'log.jsonl')
+        self.days = [datetime.datetime(2005, 1, day) for day in range(1, 4)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_and_reload(self):
+        checkpoint.ResultLog(self.path).record('Edgewater', self.days[:2], [True, False], [True, True])
+
+        log = checkpoint.ResultLog(self.path)
+        self.assertEqual(log.get_missing_days('Edgewater', self.days), self.days[2:])
+        self.assertEqual(log.get_missing_days('Uptown', self.days), self.days)
+        self.assertEqual(log.get_outcomes('Edgewater', self.days[:2]), ([True, False], [True, True]))
+
+    def test_cut_off_line(self):
+        # A line left half written by a crash shall be ignored
+        checkpoint.ResultLog(self.path).record('Edgewater', self.days[:1], [True], [True])
+        with open(self.path, 'a') as log_file:
+            log_file.write('{"area": "Edgewater", "day": "2005-01-02", "pred')
+
+        log = checkpoint.ResultLog(self.path)
+        self.assertEqual(log.get_missing_days('Edgewater', self.days), self.days[1:])
+
+        # Outcomes recorded after the cut off line still read back
+        log.record('Edgewater', self.days[1:2], [False], [True])
+        log = checkpoint.ResultLog(self.path)
+        self.assertEqual(log.get_missing_days('Edgewater', self.days), self.days[2:])
+        self.assertEqual(log.get_outcomes('Edgewater', self.days[:2]), ([True, False], [True, True]))
+
+    def test_log_key(self):
+        key = checkpoint.get_log_key('store:2001-01-01:0', BaselinePredictor)
+        # Same data and predictor, same log
+        self.assertEqual(key, checkpoint.get_log_key('store:2001-01-01:0', BaselinePredictor, {}))
+        # Anything else gets a log of its own
+        self.assertNotEqual(key, checkpoint.get_log_key('store:2001-01-01:1', BaselinePredictor))
+        self.assertNotEqual(key, checkpoint.get_log_key('store:2001-01-01:0', SequentialPredictor))
+        self.assertNotEqual(key, checkpoint.get_log_key('store:2001-01-01:0', BaselinePredictor, {'option': 1}))
@@ -1,44 +1,185 @@
+"""
+Spatial features: sums of each community area's violent crime counts with those of the areas around it.
+
+The areas around an area are described by a sparse (area x area) operator.
+Operators are built once per set of areas and settings, cached,
+and applied to every area, day and window column at once with a single sparse matrix product.
+"""
 import csv
+import json
+from functools import lru_cache
+import numpy as np
+from scipy import sparse
+from clearn import clearn_path
+from clearn import instrument
+from clearn import munge
+
+NEIGHBORS_PATH = clearn_path('config/community_area_neighbors.csv')
+GEO_PATH = clearn_path('../viewer/json/commAreasGeo.json')
+
+# Rough kilometers per degree of latitude and of longitude at Chicago's latitude
+KM_PER_DEGREE_LATITUDE = 111.0
+KM_PER_DEGREE_LONGITUDE = 111.0 * np.cos(np.radians(41.84))
+
+
+@instrument.timed('convolve.convolve_by_neighbor')
+def convolve_by_neighbor(concatenated_days_by_area, hops=1, bandwidth=None, neighbors_path=NEIGHBORS_PATH):
+    """
+    Adds a column to every data frame in concatenated_days_by_area for each of its violent crime columns
+        ('Violent Crimes' and the 'Violent Crimes in Last ...' windows),
+        summing that column over the area and the areas around it.
 
-def convolve_by_neighbor(concatenated_days_by_area):
-    neighbors_of_area = read_in_neighbors_csv('../config/community_area_neighbors.csv')
+    :param hops: areas up to this many neighbor-to-neighbor steps away are included. 1 means direct neighbors.
+    :param bandwidth: if given, each included area is weighted by exp(-distance / bandwidth),
+        where distance is in kilometers between area centroids. Otherwise every included area has weight 1.
+    :return: concatenated_days_by_area, with the new columns
+    """
+    areas = tuple(sorted(concatenated_days_by_area))
+    operator = get_spatial_operator(areas, hops, bandwidth, neighbors_path)
 
-    for area in concatenated_days_by_area:
-        convolution, convolution_week, convolution_month = generate_convolved_columns(concatenated_days_by_area, area, neighbors_of_area)
+    index = concatenated_days_by_area[areas[0]].index
+    source_columns = [column for column in concatenated_days_by_area[areas[0]].columns
+                      if column == 'Violent Crimes' or column.startswith('Violent Crimes in Last ')]
+    convolved_columns = [get_convolved_column_name(column, hops, bandwidth) for column in source_columns]
 
+    # Line every area up on the same days and stack them into one (area x day x column) tensor
+    tensor = np.array([concatenated_days_by_area[area][source_columns].reindex(index).values for area in areas],
+                      dtype=np.float64)
+
+    # Sum over the areas around every area for every day and column in a single sparse matrix product
+    convolution = operator.dot(tensor.reshape(len(areas), -1)).reshape(tensor.shape)
+
+    for position, area in enumerate(areas):
         dataframe = concatenated_days_by_area[area]
 
         # Add these columns to our data
-        dataframe['Violent Crimes in Neighbors'] = convolution
-        dataframe['Violent Crimes in Neighbors in Last Week'] = convolution_week
-        dataframe['Violent Crimes in Neighbors in Last Month'] = convolution_month
+        for column_number, convolved_column in enumerate(convolved_columns):
+            dataframe[convolved_column] = convolution[position, :, column_number]
 
     return concatenated_days_by_area
 
 
-def read_in_neighbors_csv(pathname):
+def get_convolved_column_name(column, hops=1, bandwidth=None):
+    """
+    'Violent Crimes in Last Week' becomes 'Violent Crimes in Neighbors in Last Week' for direct neighbors,
+        'Violent Crimes in 2-Hop Neighbors in Last Week' for two hops,
+        and 'Violent Crimes in Neighbors Weighted by Distance in Last Week' with a bandwidth.
+    """
+    neighbors = 'Neighbors' if hops == 1 else '{}-Hop Neighbors'.format(hops)
+    if bandwidth is not None:
+        neighbors += ' Weighted by Distance'
+    return column.replace('Violent Crimes', 'Violent Crimes in ' + neighbors, 1)
+
+
+@lru_cache(maxsize=None)
+def get_spatial_operator(areas, hops=1, bandwidth=None, neighbors_path=NEIGHBORS_PATH):
+    """
+    :param areas: tuple of community area names
+    :return: sparse (area x area) matrix in the order of areas
+        whose row for each area holds the weights of the areas summed into it (see convolve_by_neighbor)
+    """
+    operator = get_hop_matrix(areas, hops, neighbors_path)
+    if bandwidth is not None:
+        weights = np.exp(-get_distance_matrix(areas) / bandwidth)
+        operator = operator.multiply(weights)
+    return sparse.csr_matrix(operator)
+
+
+@lru_cache(maxsize=None)
+def get_hop_matrix(areas, hops=1, neighbors_path=NEIGHBORS_PATH):
+    """
+    :return: sparse (area x area) matrix with a 1 for each area itself and every area within hops steps of it
+    """
+    if hops < 1:
+        raise ValueError('Need at least one hop, got ' + str(hops))
+
+    one_hop = get_adjacency_matrix(areas, neighbors_path)
+    reachable = one_hop
+    # Each power of (self + neighbors) reaches one step further
+    for _ in range(hops - 1):
+        reachable = reachable.dot(one_hop)
+    reachable = reachable.tocoo()
+    return sparse.csr_matrix((np.ones(reachable.nnz), (reachable.row, reachable.col)), shape=reachable.shape)
+
+
+@lru_cache(maxsize=None)
+def get_adjacency_matrix(areas, neighbors_path=NEIGHBORS_PATH):
+    """
+    :param areas: tuple of community area names
+    :return: sparse (area x area) matrix in the order of areas, with a 1 for each area itself and each of its neighbors
+    """
+    neighbors_of_area = read_in_neighbors_csv(neighbors_path)
+    position_of_area = {area: position for position, area in enumerate(areas)}
+
+    rows = []
+    columns = []
+    for position, area in enumerate(areas):
+        # Each area counts its own crimes, plus every neighbor's
+        for counted_area in (area,) + neighbors_of_area[area]:
+            rows.append(position)
+            columns.append(position_of_area[counted_area])
+
+    adjacency = sparse.coo_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(areas), len(areas)))
+    return adjacency.tocsr()
+
+
+@lru_cache(maxsize=None)
+def read_in_neighbors_csv(pathname=NEIGHBORS_PATH):
+    """
+    :return: dict mapping each community area name to a tuple of its neighbors' names
+    """
     neighbors_of_area = {}
 
     with open(pathname, 'r') as neighbor_file:
         reader = csv.reader(neighbor_file)
         for line in reader:
-            neighbors_of_area[line[0]] = line[1:]
+            neighbors_of_area[line[0]] = tuple(line[1:])
 
     return neighbors_of_area
 
 
-def generate_convolved_columns(dataframes, area, neighbors_of_area):
-    list_of_neighbors_for_area = neighbors_of_area[area]
+def get_distance_matrix(areas):
+    """
+    :return: dense (area x area) array of kilometers between the centroids of areas
+    """
+    centroids = read_centroids()
+    points = np.array([centroids[area] for area in areas])
+    offsets = points[:, np.newaxis, :] - points[np.newaxis, :, :]
+    offsets *= [KM_PER_DEGREE_LONGITUDE, KM_PER_DEGREE_LATITUDE]
+    return np.sqrt((offsets ** 2).sum(axis=2))
+
+
+@lru_cache(maxsize=None)
+def read_centroids(pathname=GEO_PATH):
+    """
+    :return: dict mapping each community area name to the (longitude, latitude) of its centroid,
+        computed from the outlines of the area's polygons
+    """
+    with open(pathname, 'r') as geo_file:
+        features = json.load(geo_file)['features']
 
-    # Initialize our column to be the violent crimes in this area
-    convolution = dataframes[area]['Violent Crimes']
-    convolution_week = dataframes[area]['Violent Crimes in Last Week']
-    convolution_month = dataframes[area]['Violent Crimes in Last Month']
+    names_by_number = munge.read_translation_csv(clearn_path('config/community_areas.csv'))
+    centroids = {}
+    for feature in features:
+        geometry = feature['geometry']
+        polygons = geometry['geometries'] if geometry['type'] == 'GeometryCollection' else [geometry]
+        # Weight each polygon's centroid by its area
+        outlines = [np.array(polygon['coordinates'][0], dtype=np.float64) for polygon in polygons]
+        areas_and_centroids = [get_polygon_area_and_centroid(outline) for outline in outlines]
+        total_area = sum(area for area, _ in areas_and_centroids)
+        centroid = sum(area * point for area, point in areas_and_centroids) / total_area
+        centroids[names_by_number[str(feature['area_number'])]] = tuple(centroid)
+    return centroids
 
-    # Go through all of the neighbors, and add their sets of violent crimes to our totals
-    for actual_neighbor in list_of_neighbors_for_area:
-        convolution = convolution + dataframes[actual_neighbor]['Violent Crimes']
-        convolution_week = convolution_week + dataframes[actual_neighbor]['Violent Crimes in Last Week']
-        convolution_month = convolution_month + dataframes[actual_neighbor]['Violent Crimes in Last Month']
 
-    return [convolution, convolution_week, convolution_month]
\ No newline at end of file
+def get_polygon_area_and_centroid(outline):
+    """
+    :param outline: (point x 2) array of the corners of a polygon, in order
+    :return: tuple of (absolute area, centroid as a numpy array) by the shoelace formula
+    """
+    x, y = outline[:, 0], outline[:, 1]
+    next_x, next_y = np.roll(x, -1), np.roll(y, -1)
+    cross = x * next_y - next_x * y
+    signed_area = cross.sum() / 2
+    centroid = np.array([((x + next_x) * cross).sum(), ((y + next_y) * cross).sum()]) / (6 * signed_area)
+    return abs(signed_area), centroid
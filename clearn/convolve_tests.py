@@ -0,0 +1,69 @@
+from clearn import convolve
+from clearn import munge
+import unittest
+import numpy as np
+import pandas as pd
+
+
+class TestConvolveByNeighbor(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range('1/1/2011', periods=5, freq='D')
+        self.days_by_area = {}
+        for number, area in enumerate(munge.get_community_area_names()):
+            self.days_by_area[area] = pd.DataFrame({
+                'Violent Crimes': np.arange(5) + number,
+                'Violent Crimes in Last Week': np.arange(5) * number,
+                'Violent Crimes in Last Month': [float(number)]*5
+            }, index=index)
+        self.neighbors_of_area = convolve.read_in_neighbors_csv()
+
+    def test_matches_neighbor_sums(self):
+        # Each convolved column shall be the area's own column plus each of its neighbors'
+        expected = {}
+        for area, neighbors in self.neighbors_of_area.items():
+            expected[area] = {convolve.get_convolved_column_name(source):
+                              sum(self.days_by_area[counted][source].values for counted in (area,) + neighbors)
+                              for source in self.days_by_area[area].columns}
+
+        convolved_days = convolve.convolve_by_neighbor(self.days_by_area)
+        for area, columns in expected.items():
+            for column, values in columns.items():
+                self.assertEqual(list(convolved_days[area][column]), list(values), 'Failed on ' + area)
+
+    def test_adjacency_matrix(self):
+        areas = tuple(sorted(self.days_by_area))
+        adjacency = convolve.get_adjacency_matrix(areas)
+        edgewater = areas.index('Edgewater')
+        # A row has a one for the area and each of its neighbors
+        self.assertEqual(adjacency[edgewater].sum(), 1 + len(self.neighbors_of_area['Edgewater']))
+        self.assertEqual(adjacency[edgewater, areas.index('Uptown')], 1)
+
+    def test_two_hops(self):
+        areas = tuple(sorted(self.days_by_area))
+        two_hops = convolve.get_hop_matrix(areas, hops=2)
+        edgewater = areas.index('Edgewater')
+        # Neighbors of neighbors shall be included, but nothing further
+        expected = {'Edgewater'} | set(self.neighbors_of_area['Edgewater'])
+        for neighbor in self.neighbors_of_area['Edgewater']:
+            expected |= set(self.neighbors_of_area[neighbor])
+        self.assertEqual({areas[position] for position in two_hops[edgewater].indices}, expected)
+
+    def test_distance_weighted_columns(self):
+        convolved_days = convolve.convolve_by_neighbor(self.days_by_area, bandwidth=2.0)
+        column = 'Violent Crimes in Neighbors Weighted by Distance in Last Month'
+        self.assertIn(column, convolved_days['Edgewater'])
+        # Neighbors count for less than the area itself, so the sum is below the unweighted one
+        unweighted = sum(self.days_by_area[area]['Violent Crimes in Last Month'].values[0]
+                         for area in ('Edgewater',) + self.neighbors_of_area['Edgewater'])
+        weighted = convolved_days['Edgewater'][column].values[0]
+        self.assertLess(weighted, unweighted)
+        self.assertGreater(weighted, self.days_by_area['Edgewater']['Violent Crimes in Last Month'].values[0])
+
+    def test_centroids(self):
+        centroids = convolve.read_centroids()
+        self.assertEqual(len(centroids), 77)
+        # Rogers Park is at Chicago's north end, well north of the Loop
+        self.assertGreater(centroids['Rogers Park'][1], centroids['Loop'][1])
+        # and every centroid is somewhere around Chicago
+        for longitude, latitude in centroids.values():
+            self.assertTrue(-88.0 < longitude < -87.5 and 41.6 < latitude < 42.1)
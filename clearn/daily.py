@@ -0,0 +1,179 @@
+"""
+Daily prediction pipeline.
+
+Once day x's crimes are available from the data portal, run
+    python -m clearn.daily path/to/new_crimes.csv
+to fold them into the stored master dict (see munge.update_master_dict),
+predict day x + 1 in every community area with each predictor,
+and write the day's prediction document to data/predictions/<day x + 1>.json.
+The document for day x, written the day before, gets the actual outcomes filled in.
+Fitted models and HMM votes are kept in data/models (see models.ModelStore).
+The nonsequential predictor is the same logistic regression that evaluate.py scores, refit every day on the whole
+history, so its published predictions are the ones evaluated. Rerunning a day reuses that day's stored fit.
+The sequential predictor trains HMMs on each area's last 30 days, which are new every day,
+so it only reuses votes for windows it has seen before.
+
+A prediction document looks like
+    {
+        "day": "2015-03-02",
+        "areas": {
+            "Rogers Park": {
+                "predictions": {"sequential": "Crime", "nonsequential": "No Crime", "baseline": "Crime"},
+                "outcome": null
+            },
+            ...
+        }
+    }
+where the outcome is "Crime" or "No Crime" once the day's data is in.
+"""
+import argparse
+import datetime
+import json
+import os
+from clearn import clearn_path
+from clearn import instrument
+from clearn import models
+from clearn import munge
+from clearn import predict
+
+PREDICTIONS_PATH = clearn_path('data/predictions')
+
+# Name of each predictor in prediction documents, the predictor, and options for its constructor
+PREDICTORS = [
+    ('sequential', predict.SequentialPredictor, {'random_state': predict.HMM_RANDOM_STATE}),
+    # Same model as evaluate.py scores. Warm starting it from yesterday's fit would change its predictions,
+    #   since the solver stops at its iteration limit before converging on the raw counts.
+    ('nonsequential', predict.NonsequentialPredictor, {}),
+    ('baseline', predict.BaselinePredictor, {})
+]
+
+
+def run_daily(csv_path=None, predictions_path=PREDICTIONS_PATH, chunksize=munge.CHUNK_SIZE,
+              models_path=models.MODELS_PATH):
+    """
+    :param csv_path: csv of the new crimes to add to the master dict, or None to predict from the master dict as is
+    :param models_path: directory of the model store, or None to fit every model from scratch
+    :return: the prediction document for the day after the last day in the master dict
+    """
+    if csv_path is not None:
+        master_dict = munge.update_master_dict(csv_path, chunksize)
+    else:
+        master_dict = munge.get_master_dict()
+        if master_dict is None:
+            raise IOError('No master dictionary to predict from at ' + munge.STORE_PATH)
+
+    last_day = master_dict['Chicago'].index[-1]
+    day_to_predict = last_day + datetime.timedelta(days=1)
+
+    model_store = models.ModelStore(models_path) if models_path is not None else None
+    try:
+        document = make_prediction_document(master_dict, day_to_predict, model_store)
+    finally:
+        if model_store is not None:
+            model_store.close()
+    write_document(document, predictions_path)
+
+    # Yesterday's predictions were for last_day, which we now know the outcome of
+    previous_document = read_document(last_day, predictions_path)
+    if previous_document is not None:
+        write_document(fill_in_outcomes(previous_document, master_dict, last_day), predictions_path)
+
+    return document
+
+
+def make_prediction_document(master_dict, day_to_predict, model_store=None):
+    areas = {}
+    for name, predictor, options in PREDICTORS:
+        options = get_store_options(predictor, options, model_store)
+        with instrument.stage('daily.preprocess.' + predictor.__name__):
+            time_series_dict = predictor.preprocess(master_dict)
+        # Each predictor predicts every community area at once
+        with instrument.stage('daily.predict.' + predictor.__name__):
+            predictions = predictor.predict_all(time_series_dict, [day_to_predict], **options)
+        for area in predictions.columns:
+            area_document = areas.setdefault(area, {'predictions': {}, 'outcome': None})
+            area_document['predictions'][name] = describe(predictions[area].values[0])
+
+    return {'day': format_day(day_to_predict), 'areas': areas}
+
+
+def get_store_options(predictor, options, model_store):
+    """
+    :return: copy of options telling predictor to warm start from model_store
+    """
+    options = dict(options)
+    if model_store is None:
+        return options
+    if issubclass(predictor, predict.SequentialPredictor):
+        options.setdefault('vote_cache', model_store.get_vote_cache())
+    elif issubclass(predictor, predict.NonsequentialPredictor):
+        options.setdefault('model_store', model_store)
+    return options
+
+
+def fill_in_outcomes(document, master_dict, day):
+    for area, area_document in document['areas'].items():
+        crimes = master_dict[area]['Violent Crime Committed?']
+        position = crimes.index.get_loc(day)
+        area_document['outcome'] = describe(crimes.values[position])
+    return document
+
+
+def describe(crime_committed):
+    return 'Crime' if crime_committed else 'No Crime'
+
+
+def format_day(day):
+    return day.strftime('%Y-%m-%d')
+
+
+def get_document_path(day, predictions_path=PREDICTIONS_PATH):
+    return os.path.join(predictions_path, format_day(day) + '.json')
+
+
+def read_document(day, predictions_path=PREDICTIONS_PATH):
+    """
+    :return: the prediction document for day, or None if there isn't one
+    """
+    try:
+        with open(get_document_path(day, predictions_path), 'r') as document_file:
+            return json.load(document_file)
+    except IOError:
+        return None
+
+
+def write_document(document, predictions_path=PREDICTIONS_PATH):
+    if not os.path.isdir(predictions_path):
+        os.makedirs(predictions_path)
+    path = get_document_path(datetime.datetime.strptime(document['day'], '%Y-%m-%d'), predictions_path)
+    # Write to a temporary file and swap it in, so readers never see half a document
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as document_file:
+        json.dump(document, document_file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add a day's crimes and predict the next day in every area.")
+    parser.add_argument('csv_path', nargs='?', default=None,
+                        help="csv of the new day's crimes. Leave out to predict from the stored data as is.")
+    parser.add_argument('--output', default=PREDICTIONS_PATH, help='directory of prediction documents')
+    parser.add_argument('--models', default=models.MODELS_PATH, help='directory of stored fitted models')
+    parser.add_argument('--no-models', dest='models', action='store_const', const=None,
+                        help='fit every model from scratch, without reading or writing stored models')
+    parser.add_argument('--trace', default=None, help='path to write stage timings to as json')
+    args = parser.parse_args(argv)
+
+    if args.trace is not None:
+        instrument.enable()
+    try:
+        document = run_daily(args.csv_path, args.output, models_path=args.models)
+    finally:
+        if args.trace is not None:
+            instrument.write_trace(args.trace)
+            instrument.disable()
+    print('Wrote predictions for ' + document['day'] + ' to ' + args.output)
+
+
+if __name__ == '__main__':
+    main()
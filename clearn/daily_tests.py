@@ -0,0 +1,97 @@
+from clearn import daily
+from clearn import instrument
+from clearn import models
+from clearn import munge
+from clearn import predict
+from clearn import synthetic
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+
+class TestDaily(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        csv_directory = tempfile.mkdtemp()
+        try:
+            csv_path = os.path.join(csv_directory, 'crimes.csv')
+            synthetic.write_crimes_csv(csv_path, 20000, start=datetime.date(2010, 1, 1),
+                                       end=datetime.date(2010, 4, 1), random_state=0)
+            cls.master_dict = munge.make_master_dict(csv_path)
+        finally:
+            shutil.rmtree(csv_directory)
+
+    def setUp(self):
+        self.predictions_path = tempfile.mkdtemp()
+        self.last_day = self.master_dict['Chicago'].index[-1]
+
+    def tearDown(self):
+        shutil.rmtree(self.predictions_path)
+
+    def test_prediction_document(self):
+        day_to_predict = self.last_day + datetime.timedelta(days=1)
+        document = daily.make_prediction_document(self.master_dict, day_to_predict)
+
+        self.assertEqual(document['day'], '2010-04-02')
+        self.assertEqual(set(document['areas']), set(munge.get_community_area_names()))
+        for area_document in document['areas'].values():
+            self.assertEqual(set(area_document['predictions']), {'sequential', 'nonsequential', 'baseline'})
+            for prediction in area_document['predictions'].values():
+                self.assertIn(prediction, ['Crime', 'No Crime'])
+            # Tomorrow hasn't happened yet
+            self.assertIsNone(area_document['outcome'])
+
+    def test_warm_start(self):
+        models_path = os.path.join(self.predictions_path, 'models')
+        day_to_predict = self.last_day + datetime.timedelta(days=1)
+        model_store = models.ModelStore(models_path)
+        document = daily.make_prediction_document(self.master_dict, day_to_predict, model_store)
+        model_store.close()
+
+        # Rerunning the day shall reuse every area's fit
+        load_fit = predict.NonsequentialPredictor.load_fit
+        loaded = []
+
+        def record_load_fit(predictor, last_day):
+            loaded.append(load_fit(predictor, last_day))
+            return loaded[-1]
+
+        model_store = models.ModelStore(models_path)
+        with patch.object(predict.NonsequentialPredictor, 'load_fit', record_load_fit):
+            rerun_document = daily.make_prediction_document(self.master_dict, day_to_predict, model_store)
+        model_store.close()
+        self.assertEqual(len(loaded), len(munge.get_community_area_names()))
+        self.assertTrue(all(loaded))
+        self.assertEqual(rerun_document, document)
+
+    def test_publishes_evaluated_model(self):
+        # The nonsequential predictions shall be those of the predictor evaluate.py scores
+        day_to_predict = self.last_day + datetime.timedelta(days=1)
+        document = daily.make_prediction_document(self.master_dict, day_to_predict)
+        time_series_dict = predict.NonsequentialPredictor.preprocess(self.master_dict)
+        for area, time_series in time_series_dict.items():
+            expected = predict.NonsequentialPredictor(time_series).predict(day_to_predict)
+            self.assertEqual(document['areas'][area]['predictions']['nonsequential'], daily.describe(expected))
+
+    def test_fill_in_outcomes(self):
+        document = {'day': daily.format_day(self.last_day),
+                    'areas': {'Edgewater': {'predictions': {'baseline': 'Crime'}, 'outcome': None}}}
+        daily.write_document(document, self.predictions_path)
+
+        document = daily.fill_in_outcomes(daily.read_document(self.last_day, self.predictions_path),
+                                          self.master_dict, self.last_day)
+        expected = self.master_dict['Edgewater']['Violent Crime Committed?'].values[-1]
+        self.assertEqual(document['areas']['Edgewater']['outcome'], daily.describe(expected))
+
+    def test_missing_document(self):
+        self.assertIsNone(daily.read_document(self.last_day, self.predictions_path))
+
+    def test_trace_written_on_failure(self):
+        trace_path = os.path.join(self.predictions_path, 'trace.json')
+        with patch.object(daily, 'run_daily', side_effect=RuntimeError):
+            self.assertRaises(RuntimeError, daily.main, ['--trace', trace_path])
+        self.assertTrue(os.path.exists(trace_path))
+        self.assertFalse(instrument.is_enabled())
@@ -1,13 +1,21 @@
+from clearn import checkpoint
+from clearn import instrument
 from clearn import munge
 from clearn import predict
+from clearn import progress as progress_events
 
+from collections import namedtuple
 import datetime
 import json
 import math
+import multiprocessing
+import numpy as np
 import pandas as pd
 import random
 import sys
-import copy
+
+# Where evaluate writes its stage measurements when tracing
+TRACE_PATH = 'trace.json'
 
 """
 How do we do this?
@@ -26,32 +34,67 @@ How do we do this?
 """
 
 
-def evaluate(num_days, leave_one_out=False):
+def evaluate(num_days, leave_one_out=False, incremental=False, retrain_interval=1, n_jobs=1, chunksize=1,
+             log_directory=None, trace=False, progress=None):
     """
     Generate a JSON document mapping community area names
         to performance metrics for each algorithm
-    """
-    time_series_dict = munge.get_master_dict()
-    last_day_of_data = time_series_dict['Edgewater'].index[-1].to_datetime().date()
 
-    # Since we can't evaluate the data from data (predicting tomorrow's violent
-    # crimes), we subtract one
-    end_date = last_day_of_data - datetime.timedelta(days=1)
+    If incremental is True, the nonsequential predictor is updated day by day (walking forward through
+        the days to predict) instead of being refit on the entire history for every prediction.
+    The nonsequential predictor is only retrained every retrain_interval days.
 
-    if leave_one_out:
-        # Generate list of datetimes from Jan 1, 2005 to latest day in dataset
-        days_to_predict = get_all_days(datetime.date(2005, 1, 1), end_date)
-    else:
-        # Pick random set of num_days days from Jan 1, 2005 to latest day in dataset
-        days_to_predict = pick_days(num_days, end_date)
+    If n_jobs > 1, every (predictor, community area) pair is evaluated on a pool of n_jobs processes,
+        handing chunksize pairs at a time to each process.
 
-    # Get dicts mapping comm area to accuracy on that area
-    seq_accuracy = get_predictor_accuracy(copy.deepcopy( time_series_dict ), days_to_predict, predict.SequentialPredictor)
-    nonseq_accuracy = get_predictor_accuracy(copy.deepcopy( time_series_dict ), days_to_predict, predict.NonsequentialPredictor)
-    baseline_accuracy = get_predictor_accuracy(copy.deepcopy( time_series_dict ), days_to_predict, predict.BaselinePredictor)
+    If log_directory is given, every prediction is logged there as soon as its community area is done
+        (see checkpoint.py), and predictions already in the log are reused instead of made again.
+        So an interrupted run can be restarted, and a rerun after new days are added only predicts the new days.
 
-    rankings = create_rankings(seq_accuracy, nonseq_accuracy, baseline_accuracy, len(days_to_predict))
-    report_rankings(rankings)
+    If trace is True, the time and memory spent in each stage of evaluation
+        are written to trace.json next to results.json (see instrument.py).
+
+    progress is a sink (or list of sinks) for progress events as each community area is evaluated,
+        like progress.StderrSink() or progress.JsonLinesSink(path) (see progress.py).
+    """
+    if trace:
+        instrument.reset()
+        instrument.enable()
+
+    try:
+        time_series_dict = munge.get_master_dict()
+        last_day_of_data = time_series_dict['Edgewater'].index[-1].to_datetime().date()
+
+        # Since we can't evaluate the data from data (predicting tomorrow's violent
+        # crimes), we subtract one
+        end_date = last_day_of_data - datetime.timedelta(days=1)
+
+        if leave_one_out:
+            # Generate list of datetimes from Jan 1, 2005 to latest day in dataset
+            days_to_predict = get_all_days(datetime.date(2005, 1, 1), end_date)
+        else:
+            # Pick random set of num_days days from Jan 1, 2005 to latest day in dataset
+            days_to_predict = pick_days(num_days, end_date)
+
+        # Get dicts mapping comm area to accuracy on that area
+        predictors = [
+            (predict.SequentialPredictor, {'random_state': predict.HMM_RANDOM_STATE}),
+            (predict.NonsequentialPredictor, {'incremental': incremental, 'retrain_interval': retrain_interval}),
+            (predict.BaselinePredictor, None)
+        ]
+        seq_accuracy, nonseq_accuracy, baseline_accuracy = get_accuracy_of_predictors(
+            time_series_dict, days_to_predict, predictors, n_jobs, chunksize, log_directory, progress)
+        seq_accuracy, nonseq_accuracy, baseline_accuracy = [
+            {area: confusion.correct for area, confusion in confusion_by_area.items()}
+            for confusion_by_area in [seq_accuracy, nonseq_accuracy, baseline_accuracy]]
+
+        rankings = create_rankings(seq_accuracy, nonseq_accuracy, baseline_accuracy, len(days_to_predict))
+        report_rankings(rankings)
+    finally:
+        # A run that dies still leaves the trace of the stages it got through
+        if trace:
+            instrument.write_trace(TRACE_PATH)
+            instrument.disable()
 
 
 def pick_days(num_days, end_date):
@@ -74,47 +117,222 @@ def get_all_days(start_date, end_date):
 """
 get_predictor_accuracy takes:
     days_to_predict: a list of datetimes on which to generate and test predictions
+    predictor_options: optional dict of keyword arguments for the predictor's constructor
+    n_jobs: number of processes to evaluate community areas on (1 evaluates them in this process)
+    chunksize: number of community areas handed to a process at a time
+    progress: optional sink or list of sinks for progress events (see progress.py)
 and returns:
-    accuracy_by_comm_area: a dict mapping community area names to the number of days correctly classified
+    accuracy_by_comm_area: a dict mapping community area names to the Confusion of the predictor's results there
 """
 
-def get_predictor_accuracy(time_series_dict, days_to_predict, predictor_to_use):
-    if not issubclass(predictor_to_use, predict.Predictor):
-        raise ValueError("Please pass in a valid predictor.")
+def get_predictor_accuracy(time_series_dict, days_to_predict, predictor_to_use, predictor_options=None,
+                           n_jobs=1, chunksize=1, progress=None):
+    return get_accuracy_of_predictors(time_series_dict, days_to_predict, [(predictor_to_use, predictor_options)],
+                                      n_jobs, chunksize, progress=progress)[0]
+
+def get_accuracy_of_predictors(time_series_dict, days_to_predict, predictors, n_jobs=1, chunksize=1,
+                               log_directory=None, progress=None):
+    """
+    :param predictors: list of (predictor class, options) tuples, where options is a dict of keyword arguments
+        for the predictor's constructor or None
+    :param log_directory: directory of checkpoint.ResultLogs to reuse and record predictions in, or None
+    :param progress: sink or list of sinks for progress events, or None
+    :return: list with a dict mapping community area names to Confusions
+        for each predictor, in the same order as predictors
+    """
+    for predictor_to_use, _ in predictors:
+        if not isinstance(predictor_to_use, type) or not issubclass(predictor_to_use, predict.Predictor):
+            raise ValueError("Please pass in a valid predictor.")
+
+    if log_directory is not None:
+        return get_logged_accuracy_of_predictors(time_series_dict, days_to_predict, predictors, n_jobs, chunksize,
+                                                 log_directory, progress)
+
+    # Each (predictor, area) pair is an independent unit of work
+    areas = []
+    work_units = []
+    for map_number, (predictor_to_use, predictor_options) in enumerate(predictors):
+        # preprocess leaves time_series_dict untouched, so every predictor can share it
+        with instrument.stage('evaluate.preprocess.' + predictor_to_use.__name__):
+            processed_time_series_dict = predictor_to_use.preprocess(time_series_dict)
+        for area in sorted(processed_time_series_dict):
+            areas.append((map_number, area))
+            work_units.append((processed_time_series_dict[area], days_to_predict, predictor_to_use,
+                               predictor_options))
+
+    tracker, report_progress = track_progress(areas, work_units, progress)
+    tracker.start()
+    accuracies = run_work_units(work_units, n_jobs, chunksize, on_result=report_progress)
+    tracker.finish()
+
+    area_to_performance_maps = [{} for _ in predictors]
+    for (map_number, area), accuracy in zip(areas, accuracies):
+        area_to_performance_maps[map_number][area] = accuracy
+
+    return area_to_performance_maps
+
+def get_logged_accuracy_of_predictors(time_series_dict, days_to_predict, predictors, n_jobs, chunksize,
+                                      log_directory, progress=None):
+    """
+    Like get_accuracy_of_predictors, but only predicts the days missing from each predictor's log,
+        and records their outcomes as each (predictor, area) pair finishes.
+    """
+    logs = [checkpoint.open_log(time_series_dict, predictor_to_use, predictor_options, log_directory)
+            for predictor_to_use, predictor_options in predictors]
+
+    areas_by_predictor = []
+    areas = []
+    work_units = []
+    for map_number, (predictor_to_use, predictor_options) in enumerate(predictors):
+        with instrument.stage('evaluate.preprocess.' + predictor_to_use.__name__):
+            processed_time_series_dict = predictor_to_use.preprocess(time_series_dict)
+        areas_by_predictor.append(sorted(processed_time_series_dict))
+        for area in areas_by_predictor[-1]:
+            missing_days = logs[map_number].get_missing_days(area, days_to_predict)
+            if missing_days:
+                areas.append((map_number, area))
+                work_units.append((processed_time_series_dict[area], missing_days, predictor_to_use,
+                                   predictor_options))
+
+    tracker, report_progress = track_progress(areas, work_units, progress)
+
+    def record_outcomes(position, outcomes):
+        map_number, area = areas[position]
+        logs[map_number].record(area, *outcomes)
+        report_progress(position, outcomes)
+
+    tracker.start()
+    run_work_units(work_units, n_jobs, chunksize, work=get_outcomes_in_area, on_result=record_outcomes)
+    tracker.finish()
+
+    return [{area: Confusion.from_outcomes(*log.get_outcomes(area, days_to_predict)) for area in predictor_areas}
+            for log, predictor_areas in zip(logs, areas_by_predictor)]
+
+def track_progress(areas, work_units, progress):
+    """
+    :param areas: list of (predictor number, area) tuples, one for each unit in work_units
+    :return: tuple of (progress.ProgressTracker for work_units,
+        function to call with each unit's position and result once it's done)
+    """
+    areas_by_predictor = {}
+    for _, _, predictor_to_use, _ in work_units:
+        areas_by_predictor[predictor_to_use.__name__] = areas_by_predictor.get(predictor_to_use.__name__, 0) + 1
+    tracker = progress_events.ProgressTracker(areas_by_predictor, progress_events.make_sinks(progress))
 
-    processed_time_series_dict = predictor_to_use.preprocess(time_series_dict)
+    def report_progress(position, _):
+        dataframe, days, predictor_to_use, _ = work_units[position]
+        tracker.area_done(predictor_to_use.__name__, areas[position][1], len(days))
 
-    area_to_performance_map = {}
-    for area, dataframe in processed_time_series_dict.items():
-        area_to_performance_map[area] = get_predictor_accuracy_in_area(dataframe, days_to_predict, predictor_to_use)
+    return tracker, report_progress
 
-    return area_to_performance_map
+def run_work_units(work_units, n_jobs=1, chunksize=1, work=None, on_result=None):
+    """
+    Calls work (get_predictor_accuracy_in_area by default) with each tuple of arguments in work_units,
+        on a pool of n_jobs processes if n_jobs > 1.
+    If on_result is given, it's called with each unit's position and result as soon as the result is in.
+    :return: list of results in the same order as work_units
+    """
+    if work is None:
+        work = get_predictor_accuracy_in_area
+
+    if n_jobs <= 1 or len(work_units) <= 1:
+        results = []
+        for position, arguments in enumerate(work_units):
+            results.append(work(*arguments))
+            if on_result is not None:
+                on_result(position, results[-1])
+        return results
+
+    pool = multiprocessing.Pool(min(n_jobs, len(work_units)))
+    try:
+        # imap returns results in the order of work_units, no matter which process finishes first
+        results = []
+        tracing = instrument.is_enabled()
+        for position, (result, stages) in enumerate(pool.imap(call_work,
+                                                               [(work, arguments, tracing) for arguments in work_units],
+                                                               chunksize)):
+            # Stages measured in the worker process count toward this process's trace
+            instrument.merge(stages)
+            results.append(result)
+            if on_result is not None:
+                on_result(position, result)
+        return results
+    finally:
+        pool.close()
+        pool.join()
+
+def call_work(work_arguments_and_tracing):
+    """
+    Runs one unit of work in a worker process
+    :return: tuple of (result, stages measured while doing the work)
+    """
+    work, arguments, tracing = work_arguments_and_tracing
+    instrument.reset()
+    if tracing:
+        instrument.enable()
+    else:
+        instrument.disable()
+    return work(*arguments), instrument.get_stages()
 
-def get_predictor_accuracy_in_area(dataframe, days_to_predict, predictor_to_use):
-    predictor = predictor_to_use(dataframe)
+def get_predictor_accuracy_in_area(dataframe, days_to_predict, predictor_to_use, predictor_options=None):
+    _, predicted_results, actual_results = get_outcomes_in_area(dataframe, days_to_predict, predictor_to_use,
+                                                                predictor_options)
+    return Confusion.from_outcomes(predicted_results, actual_results)
 
-    last_date = dataframe.index[-1].date()
+def get_outcomes_in_area(dataframe, days_to_predict, predictor_to_use, predictor_options=None):
+    """
+    :return: tuple of (days, predicted results, actual results), with days sorted in the order they were predicted.
+        days_to_predict itself is left in its original order.
+    """
+    predictor = predictor_to_use(dataframe, **(predictor_options or {}))
 
-    days_to_predict.sort()
-    first_predicted_date = days_to_predict[0].date()
-    last_predicted_date = days_to_predict[-1].date()
+    days = pd.DatetimeIndex(sorted(days_to_predict))
+    first_predicted_date = days[0].date()
+    last_predicted_date = days[-1].date()
 
     # Don't start predicting before 2005
     if first_predicted_date < datetime.date(2005,1,1):
         raise ValueError("Don't predict dates before 2005")
 
-    if last_predicted_date > last_date:
-        raise ValueError("Can't predict beyond our last data point")
+    # Convert the days to integer timestamps once. The predictor works out its row positions from the same array
+    #   (see predict.get_day_positions), and every actual result is looked up with one array gather.
+    stamps = predict.get_stamps(days)
+    with instrument.stage('evaluate.score.' + predictor_to_use.__name__):
+        positions = predict.get_day_positions(dataframe.index, stamps)
+        index_stamps = predict.get_stamps(dataframe.index)
+        if (positions >= len(index_stamps)).any() or (index_stamps[positions] != stamps).any():
+            raise ValueError("Can't predict beyond our last data point")
+        actual_results = dataframe['Violent Crime Committed?'].values[positions].astype(bool)
+
+    # Make every prediction in one call so the predictor can share work across days
+    with instrument.stage('evaluate.predict.' + predictor_to_use.__name__):
+        predicted_results = np.asarray(predictor.predict_many(days), dtype=bool)
 
-    number_correct_predictions = 0
+    return list(days), predicted_results, actual_results
 
-    for day in days_to_predict:
-        predicted_result = predictor.predict(day)
-        actual_result = dataframe['Violent Crime Committed?'].loc[day]
-        if actual_result == predicted_result:
-            number_correct_predictions += 1
 
-    return number_correct_predictions
+class Confusion(namedtuple('Confusion', ['true_positives', 'false_positives', 'true_negatives', 'false_negatives'])):
+    """
+    Counts of each kind of right and wrong prediction, where positive means a violent crime was predicted
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_outcomes(cls, predicted_results, actual_results):
+        predicted_results = np.asarray(predicted_results, dtype=bool)
+        actual_results = np.asarray(actual_results, dtype=bool)
+        return cls(true_positives=int(np.sum(predicted_results & actual_results)),
+                   false_positives=int(np.sum(predicted_results & ~actual_results)),
+                   true_negatives=int(np.sum(~predicted_results & ~actual_results)),
+                   false_negatives=int(np.sum(~predicted_results & actual_results)))
+
+    @property
+    def correct(self):
+        return self.true_positives + self.true_negatives
+
+    @property
+    def total(self):
+        return sum(self)
 
 
 class Ranking:
@@ -1,5 +1,7 @@
 from clearn import clearn_path
 from clearn import evaluate
+from clearn import instrument
+from clearn.predict import BaselinePredictor
 from clearn.predict import NonsequentialPredictor
 from unittest.mock import MagicMock
 from unittest.mock import patch
@@ -7,12 +9,24 @@ import copy
 import datetime
 import json
 import os
+import shutil
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
 
 class TestEvaluate(unittest.TestCase):
-    pass
+    def test_trace_written_on_failure(self):
+        directory = tempfile.mkdtemp()
+        trace_path = os.path.join(directory, 'trace.json')
+        try:
+            with patch.object(evaluate, 'TRACE_PATH', trace_path), \
+                    patch.object(evaluate.munge, 'get_master_dict', side_effect=RuntimeError):
+                self.assertRaises(RuntimeError, evaluate.evaluate, 10, trace=True)
+            self.assertTrue(os.path.exists(trace_path))
+            self.assertFalse(instrument.is_enabled())
+        finally:
+            shutil.rmtree(directory)
 
 class TestZTest(unittest.TestCase):
     def test_with_first_significantly_better(self):
@@ -218,7 +232,7 @@ class TestPredictorAccuracy(unittest.TestCase):
         self.predictor = NonsequentialPredictor
 
         # Have accuracy always return 100 correct predictions
-        evaluate.get_predictor_accuracy_in_area = lambda x, y, z: 100
+        evaluate.get_predictor_accuracy_in_area = lambda x, y, z, options: 100
 
     def test_get_accuracy(self):
         days_to_predict = pd.date_range(datetime.date(2001,1,1), datetime.date(2001, 1, 5))
@@ -243,30 +257,126 @@ class TestPredictorAccuracy(unittest.TestCase):
         NonsequentialPredictor.preprocess = self.backup_preprocess
         evaluate.get_predictor_accuracy_in_area = self.backup_accuracy
 
+class TestParallelPredictorAccuracy(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range(datetime.date(2004, 12, 1), datetime.date(2005, 3, 1))
+        self.time_series_dict = {'Chicago': pd.DataFrame({'Violent Crimes': 1.0}, index=index)}
+        for area, period in [('Pittsburgh', 2), ('Philidelphia', 3), ('Boston', 5)]:
+            self.time_series_dict[area] = pd.DataFrame({'Violent Crime Committed?': np.arange(len(index)) % period == 0},
+                                                       index=index)
+        self.days_to_predict = evaluate.get_all_days(datetime.date(2005, 1, 1), datetime.date(2005, 2, 1))
+
+    def test_parallel_matches_serial(self):
+        serial = evaluate.get_predictor_accuracy(self.time_series_dict, self.days_to_predict,
+                                                 BaselinePredictor)
+        parallel = evaluate.get_predictor_accuracy(self.time_series_dict, self.days_to_predict,
+                                                   BaselinePredictor, n_jobs=2, chunksize=2)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(set(serial.keys()), {'Pittsburgh', 'Philidelphia', 'Boston'})
+
+    def test_progress(self):
+        events = []
+        evaluate.get_predictor_accuracy(self.time_series_dict, self.days_to_predict, BaselinePredictor,
+                                        progress=events.append)
+        area_events = [event for event in events if event['event'] == 'area_done']
+        self.assertEqual(sorted(event['area'] for event in area_events), ['Boston', 'Philidelphia', 'Pittsburgh'])
+        self.assertEqual(area_events[-1]['units_done'], 3)
+        self.assertEqual(area_events[-1]['predictions'], len(self.days_to_predict))
+
+    def test_several_predictors(self):
+        # Results shall come back in the order the predictors were given
+        accuracies = evaluate.get_accuracy_of_predictors(
+            self.time_series_dict, self.days_to_predict, [(BaselinePredictor, None), (BaselinePredictor, None)],
+            n_jobs=2)
+        self.assertEqual(len(accuracies), 2)
+        self.assertEqual(accuracies[0], accuracies[1])
+
+
+class TestLoggedPredictorAccuracy(TestParallelPredictorAccuracy):
+    def setUp(self):
+        super().setUp()
+        self.log_directory = tempfile.mkdtemp()
+        self.backup_predict_many = BaselinePredictor.predict_many
+
+    def tearDown(self):
+        BaselinePredictor.predict_many = self.backup_predict_many
+        shutil.rmtree(self.log_directory)
+
+    def get_accuracy(self, days_to_predict):
+        return evaluate.get_accuracy_of_predictors(self.time_series_dict, days_to_predict,
+                                                   [(BaselinePredictor, None)], log_directory=self.log_directory)[0]
+
+    def test_logged_matches_unlogged(self):
+        expected = evaluate.get_predictor_accuracy(self.time_series_dict, self.days_to_predict, BaselinePredictor)
+        self.assertEqual(self.get_accuracy(self.days_to_predict), expected)
+
+    def test_resume(self):
+        # Log the first half of the days
+        self.get_accuracy(self.days_to_predict[:16])
+        expected = evaluate.get_predictor_accuracy(self.time_series_dict, self.days_to_predict, BaselinePredictor)
+
+        # Rerunning on every day shall only predict the days that aren't logged yet
+        predict_many = BaselinePredictor.predict_many
+        predicted_days = []
+
+        def record_days(predictor, days):
+            predicted_days.extend(days)
+            return predict_many(predictor, days)
+
+        BaselinePredictor.predict_many = record_days
+        self.assertEqual(self.get_accuracy(self.days_to_predict), expected)
+        self.assertEqual(len(predicted_days), 3*(len(self.days_to_predict) - 16))
+
+        # and a second rerun shall predict nothing at all.
+        predicted_days.clear()
+        self.assertEqual(self.get_accuracy(self.days_to_predict), expected)
+        self.assertEqual(predicted_days, [])
+
+
 class TestPredictorAreaAccuracy(unittest.TestCase):
     def setUp(self):
-        self.backup_predict = NonsequentialPredictor.predict
+        self.backup_predict_many = NonsequentialPredictor.predict_many
         self.predictor = NonsequentialPredictor
 
     def test_predictor_accuracy_in_area_all_correct(self):
-        self.predictor.predict = MagicMock(return_value=True)
+        self.predictor.predict_many = MagicMock(return_value=np.array([True]*100))
 
         expected_true_days = 100
-        actual_true_days = self.get_actual_true_days()
+        actual_true_days = self.get_actual_true_days().correct
 
         self.assertEqual(expected_true_days, actual_true_days)
 
     def test_predictor_accuracy_in_area_some_correct(self):
-        # Generate a list of values to use as return values for the
-        # stubbed function; namely, alternately return True and False
+        # Generate a list of values to use as the stubbed function's predictions;
+        # namely, alternately predict True and False
         alternating_list = np.resize([True, False], 100)
-        self.predictor.predict = MagicMock(side_effect=alternating_list)
+        self.predictor.predict_many = MagicMock(return_value=alternating_list)
 
         expected_true_days = 50
-        actual_true_days = self.get_actual_true_days()
+        actual_true_days = self.get_actual_true_days().correct
 
         self.assertEqual(expected_true_days, actual_true_days)
 
+    def test_confusion_counts(self):
+        predicted = np.array([True, True, False, False, True])
+        actual = np.array([True, False, False, True, True])
+        confusion = evaluate.Confusion.from_outcomes(predicted, actual)
+        self.assertEqual(confusion, (2, 1, 1, 1))
+        self.assertEqual(confusion.correct, 3)
+        self.assertEqual(confusion.total, 5)
+
+    def test_days_left_unsorted(self):
+        self.predictor.predict_many = MagicMock(return_value=np.array([True]*100))
+        days_to_predict = evaluate.get_all_days(datetime.date(2005,1,1), datetime.date(2005,4,10))
+        dataframe = pd.DataFrame({'Violent Crime Committed?': True}, index=days_to_predict)
+        reversed_days = list(reversed(days_to_predict))
+        evaluate.get_predictor_accuracy_in_area(dataframe, reversed_days, self.predictor)
+
+        # The caller's list shall keep its order...
+        self.assertEqual(reversed_days, list(reversed(days_to_predict)))
+        # while the predictor still gets the days in increasing order
+        self.assertEqual(list(self.predictor.predict_many.call_args[0][0]), list(days_to_predict))
+
     def test_predict_too_many_days(self):
         days_to_predict = evaluate.pick_days(100, datetime.date(2007,1,1))
         days_for_dataframe = evaluate.get_all_days(datetime.date(2005,1,1), datetime.date(2005, 3, 1))
@@ -275,6 +385,14 @@ class TestPredictorAreaAccuracy(unittest.TestCase):
         with self.assertRaises(ValueError):
             evaluate.get_predictor_accuracy_in_area(dataframe, days_to_predict, self.predictor)
 
+    def test_predict_missing_day(self):
+        days_for_dataframe = evaluate.get_all_days(datetime.date(2005,1,1), datetime.date(2005, 3, 1))
+        dataframe = pd.DataFrame({'Violent Crime Committed?': True}, index=days_for_dataframe).drop(
+            days_for_dataframe[10])
+
+        with self.assertRaises(ValueError):
+            evaluate.get_predictor_accuracy_in_area(dataframe, days_for_dataframe[5:15], self.predictor)
+
     def get_actual_true_days(self):
         # Exactly 100 days
         days_to_predict = evaluate.get_all_days(datetime.date(2005,1,1), datetime.date(2005,4,10))
@@ -287,7 +405,7 @@ class TestPredictorAreaAccuracy(unittest.TestCase):
         return evaluate.get_predictor_accuracy_in_area(dataframe, days_to_predict, self.predictor)
 
     def tearDown(self):
-        NonsequentialPredictor.predict = self.backup_predict
+        NonsequentialPredictor.predict_many = self.backup_predict_many
 
 class TestHelperFunctions(unittest.TestCase):
     def test_get_all_days_in_range(self):
@@ -0,0 +1,268 @@
+"""
+Helpers for the hidden Markov models behind SequentialPredictor (see predict.py).
+
+Besides a cache for HMM votes, this module has an HMM engine for discrete emissions
+that trains a whole batch of equal length sequences at once.
+Every sequence gets its own model, but Baum-Welch, forward-backward and voting
+run as array operations over the entire batch instead of one small sequence at a time.
+"""
+from collections import OrderedDict
+import multiprocessing
+import shelve
+import numpy as np
+
+# Keeps probabilities away from zero so that nothing divides by zero
+EPSILON = 1e-300
+
+
+class VoteCache():
+    """
+    Bounded least-recently-used cache of HMM votes,
+        keyed by the crime sequence the HMMs were trained on and the settings they were trained with.
+    Neighboring days and similar areas often share the same 30 day sequence,
+        so a vote can be reused instead of training the HMMs again.
+
+    If path is given, votes are also written to a shelve database at path so that they survive between runs.
+    """
+
+    def __init__(self, max_size=100000, path=None):
+        self.max_size = max_size
+        self.votes = OrderedDict()
+        self.shelf = shelve.open(path) if path is not None else None
+
+        # Lookups answered from memory, from disk, and not at all
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(binary_sequence, settings):
+        """
+        :param binary_sequence: list of 0/1 values
+        :param settings: tuple of everything else the vote depends on (HMM settings, random seed...)
+        :return: string packing the sequence into an integer (written in hex) followed by the settings
+        """
+        packed = 0
+        for bit in binary_sequence:
+            packed = (packed << 1) | int(bit)
+        # Keep the length so that sequences with leading zeros don't collide
+        return '{}:{:x}:{}'.format(len(binary_sequence), packed, ':'.join(str(setting) for setting in settings))
+
+    def get(self, key):
+        """
+        :return: the vote cached under key, or None if there isn't one
+        """
+        if key in self.votes:
+            self.hits += 1
+            # Mark as most recently used
+            self.votes.move_to_end(key)
+            return self.votes[key]
+
+        if self.shelf is not None and key in self.shelf:
+            self.disk_hits += 1
+            vote = self.shelf[key]
+            self.remember(key, vote)
+            return vote
+
+        self.misses += 1
+        return None
+
+    def put(self, key, vote):
+        self.remember(key, vote)
+        if self.shelf is not None:
+            self.shelf[key] = vote
+
+    def remember(self, key, vote):
+        self.votes[key] = vote
+        self.votes.move_to_end(key)
+        while len(self.votes) > self.max_size:
+            # Forget the least recently used vote
+            self.votes.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'size': len(self.votes)}
+
+    def close(self):
+        if self.shelf is not None:
+            self.shelf.close()
+            self.shelf = None
+
+
+# Shared by every SequentialPredictor that isn't given its own cache
+SHARED_VOTE_CACHE = VoteCache()
+
+
+def fit(sequences, n_components=3, n_symbols=2, tol=1e-2, n_iter=1000, random_state=None):
+    """
+    Trains one HMM per sequence with Baum-Welch, all at once.
+    Each HMM stops training once its log likelihood improves by less than tol, or after n_iter iterations.
+
+    :param sequences: (batch x time) integer array of emissions, each between 0 and n_symbols - 1
+    :param random_state: seed for the random initial emission probabilities.
+        With a seed, every HMM starts from the same parameters, so an HMM's result only depends on its own
+        sequence, never on the rest of the batch.
+    :return: tuple of (startprob, transmat, emissionprob, posteriors) with shapes
+        (batch x state), (batch x state x state), (batch x state x symbol), and (batch x time x state)
+    """
+    sequences = np.asarray(sequences, dtype=np.int64)
+    startprob, transmat, emissionprob = init_params(len(sequences), n_components, n_symbols, random_state)
+    # one_hot[b, t, m] is 1 if sequence b emitted symbol m at time t
+    one_hot = (sequences[:, :, np.newaxis] == np.arange(n_symbols)).astype(np.float64)
+
+    # Positions in the batch of the HMMs that are still training
+    active = np.arange(len(sequences))
+    previous_log_likelihood = np.full(len(sequences), -np.inf)
+    for _ in range(n_iter):
+        if len(active) == 0:
+            break
+        posteriors, transition_counts, log_likelihood = forward_backward(
+            sequences[active], startprob[active], transmat[active], emissionprob[active])
+
+        # Maximization step for every active HMM at once
+        startprob[active] = posteriors[:, 0]
+        transmat[active] = normalize(transition_counts, axis=2)
+        emissionprob[active] = normalize(np.einsum('btn,btm->bnm', posteriors, one_hot[active]), axis=2)
+
+        improving = log_likelihood - previous_log_likelihood[active] >= tol
+        previous_log_likelihood[active] = log_likelihood
+        active = active[improving]
+
+    posteriors, _, _ = forward_backward(sequences, startprob, transmat, emissionprob)
+    return startprob, transmat, emissionprob, posteriors
+
+
+def init_params(batch_size, n_components, n_symbols, random_state=None):
+    """
+    Like hmmlearn's MultinomialHMM: uniform start and transition probabilities, random emission probabilities
+    """
+    startprob = np.full((batch_size, n_components), 1.0 / n_components)
+    transmat = np.full((batch_size, n_components, n_components), 1.0 / n_components)
+    if random_state is None:
+        emissionprob = np.random.rand(batch_size, n_components, n_symbols)
+    else:
+        emissionprob = np.empty((batch_size, n_components, n_symbols))
+        emissionprob[:] = np.random.RandomState(random_state).rand(n_components, n_symbols)
+    return startprob, transmat, normalize(emissionprob, axis=2)
+
+
+def forward_backward(sequences, startprob, transmat, emissionprob):
+    """
+    Scaled forward-backward pass over every sequence at once.
+
+    :return: tuple of (posteriors, transition_counts, log_likelihood) where
+        posteriors[b, t, i] is the probability that sequence b was in state i at time t,
+        transition_counts[b, i, j] is the expected number of transitions from i to j in sequence b, and
+        log_likelihood[b] is the log likelihood of sequence b
+    """
+    batch_size, length = sequences.shape
+    n_components = startprob.shape[1]
+    # emissions[b, t, i] is the probability that state i emits what sequence b emitted at time t
+    emissions = emissionprob[np.arange(batch_size)[:, np.newaxis], :, sequences]
+
+    alpha = np.empty((batch_size, length, n_components))
+    scale = np.empty((batch_size, length))
+    alpha[:, 0] = startprob * emissions[:, 0]
+    for t in range(length):
+        if t > 0:
+            alpha[:, t] = np.einsum('bi,bij->bj', alpha[:, t - 1], transmat) * emissions[:, t]
+        scale[:, t] = alpha[:, t].sum(axis=1) + EPSILON
+        alpha[:, t] /= scale[:, t, np.newaxis]
+
+    beta = np.empty((batch_size, length, n_components))
+    beta[:, -1] = 1.0
+    for t in range(length - 2, -1, -1):
+        beta[:, t] = np.einsum('bij,bj->bi', transmat, emissions[:, t + 1] * beta[:, t + 1])
+        beta[:, t] /= scale[:, t + 1, np.newaxis]
+
+    posteriors = normalize(alpha * beta, axis=2)
+    next_terms = emissions[:, 1:] * beta[:, 1:] / scale[:, 1:, np.newaxis]
+    transition_counts = np.einsum('bti,bij,btj->bij', alpha[:, :-1], transmat, next_terms)
+    log_likelihood = np.log(scale).sum(axis=1)
+    return posteriors, transition_counts, log_likelihood
+
+
+def vote(sequences, n_components=3, n_symbols=2, tol=1e-2, n_iter=1000, random_state=None):
+    """
+    Trains one HMM per sequence and has each HMM vote for the most likely emission after its sequence ends.
+    :return: integer array with each HMM's vote
+    """
+    _, transmat, emissionprob, posteriors = fit(sequences, n_components, n_symbols, tol, n_iter, random_state)
+    batch = np.arange(len(transmat))
+    # Most likely state of the last step in each sequence...
+    current_states = posteriors[:, -1].argmax(axis=1)
+    # then the most likely state that follows it...
+    next_states = transmat[batch, current_states].argmax(axis=1)
+    # and the most likely emission from that state
+    return emissionprob[batch, next_states].argmax(axis=1)
+
+
+def get_restart_seeds(n_restarts, random_state=None):
+    """
+    :return: list with a seed for each restart. Restart i gets random_state + i,
+        so the same random_state trains the same HMMs on any run or machine.
+        Without a random_state every restart is seeded randomly (None).
+    """
+    if random_state is None:
+        return [None]*n_restarts
+    return [random_state + restart for restart in range(n_restarts)]
+
+
+def majority_vote(train_restart, seeds, batch_size, n_jobs=1):
+    """
+    Majority vote of an ensemble of randomly restarted HMMs for each of batch_size sequences.
+    Once either side has a majority for a sequence, the remaining restarts skip it,
+        and the ensemble stops as soon as every sequence is decided.
+
+    :param train_restart: function of (seed, positions) that trains HMMs on the sequences at positions
+        (an integer array of positions in the batch) and returns their 0/1 votes.
+        With n_jobs > 1 it must be picklable, like a functools.partial of vote_restart.
+    :param seeds: one seed per restart (see get_restart_seeds)
+    :param n_jobs: number of restarts to train at once in worker processes.
+        Training is CPU-bound Python and numpy, so threads wouldn't run it in parallel.
+        Pools can't be started from inside another pool's workers (like evaluate's), so keep n_jobs=1 there.
+    :return: boolean array that is True where more than half of the restarts vote 1. Ties vote 0.
+    """
+    n_restarts = len(seeds)
+    majority = n_restarts // 2 + 1
+    crime_votes = np.zeros(batch_size, dtype=np.int64)
+    no_crime_votes = np.zeros(batch_size, dtype=np.int64)
+    undecided = np.arange(batch_size)
+
+    pool = multiprocessing.Pool(min(n_jobs, n_restarts)) if n_jobs > 1 and n_restarts > 1 else None
+    try:
+        next_restart = 0
+        while next_restart < n_restarts and len(undecided) > 0:
+            # Train a wave of restarts on the sequences that are still undecided.
+            #   A wave is never bigger than the fewest votes any sequence still needs for a majority,
+            #   so the ensemble can stop early however many restarts run at once.
+            votes_needed = majority - np.maximum(crime_votes[undecided], no_crime_votes[undecided]).max()
+            wave = seeds[next_restart:next_restart + max(min(n_jobs, votes_needed), 1)]
+            next_restart += len(wave)
+            if pool is None or len(wave) == 1:
+                wave_votes = [train_restart(seed, undecided) for seed in wave]
+            else:
+                wave_votes = pool.starmap(train_restart, [(seed, undecided) for seed in wave])
+
+            for votes in wave_votes:
+                votes = np.asarray(votes, dtype=np.int64)
+                crime_votes[undecided] += votes
+                no_crime_votes[undecided] += 1 - votes
+            is_decided = (2*crime_votes[undecided] > n_restarts) | (2*no_crime_votes[undecided] >= n_restarts)
+            undecided = undecided[~is_decided]
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return 2*crime_votes > n_restarts
+
+
+def vote_restart(sequences, seed, positions, n_components=3, n_symbols=2, tol=1e-2, n_iter=1000):
+    """
+    One restart for majority_vote: the votes of HMMs seeded with seed on the sequences at positions.
+    Bind sequences and the HMM settings with functools.partial.
+    """
+    return vote(sequences[positions], n_components, n_symbols, tol, n_iter, random_state=seed)
+
+
+def normalize(array, axis):
+    return array / (array.sum(axis=axis, keepdims=True) + EPSILON)
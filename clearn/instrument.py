@@ -0,0 +1,157 @@
+"""
+Optional instrumentation of the stages of munging and evaluation.
+
+Wrap a stage in `with instrument.stage('name'):` or decorate a function with `@instrument.timed('name')`.
+While instrumentation is enabled, every stage records its number of calls, its wall time,
+the process's peak resident memory as of the end of the stage (max_rss_mb, a high-water mark for the whole process),
+and how far the stage itself raised that peak (max_rss_growth_mb). write_trace saves the records as json.
+While it's disabled (the default), stages cost one flag check and record nothing.
+"""
+from functools import wraps
+import datetime
+import json
+import resource
+import sys
+import time
+
+enabled = False
+# Maps stage names to dicts of their measurements
+stages = {}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def is_enabled():
+    return enabled
+
+
+def reset():
+    stages.clear()
+
+
+class Stage():
+    """
+    Context manager recording the time between entering and leaving it under name
+    """
+    __slots__ = ('name', 'started', 'max_rss_mb')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+        self.max_rss_mb = None
+
+    def __enter__(self):
+        self.max_rss_mb = get_max_rss_mb()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.name, time.perf_counter() - self.started, self.max_rss_mb)
+        return False
+
+
+class NoStage():
+    """
+    Context manager that does nothing, handed out while instrumentation is disabled
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_STAGE = NoStage()
+
+
+def stage(name):
+    """
+    :return: context manager that records the stage called name if instrumentation is enabled
+    """
+    return Stage(name) if enabled else NO_STAGE
+
+
+def timed(name=None):
+    """
+    Decorator recording every call of the decorated function as a stage called name
+        (the function's module and name by default)
+    """
+    def decorate(function):
+        stage_name = name or function.__module__ + '.' + function.__name__
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Stage(stage_name):
+                return function(*args, **kwargs)
+        return timed_function
+    return decorate
+
+
+def record(name, seconds, max_rss_mb_before=None):
+    """
+    :param max_rss_mb_before: get_max_rss_mb() when the stage started, to tell how far the stage raised it
+    """
+    if name not in stages:
+        stages[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'max_rss_mb': 0.0, 'max_rss_growth_mb': 0.0}
+    measurements = stages[name]
+    max_rss_mb = get_max_rss_mb()
+    measurements['calls'] += 1
+    measurements['seconds'] += seconds
+    measurements['max_seconds'] = max(measurements['max_seconds'], seconds)
+    measurements['max_rss_mb'] = max(measurements['max_rss_mb'], max_rss_mb)
+    if max_rss_mb_before is not None:
+        measurements['max_rss_growth_mb'] += max_rss_mb - max_rss_mb_before
+
+
+def get_max_rss_mb():
+    """
+    :return: peak resident memory of this process since it started, in megabytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, OS X bytes
+    return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10
+
+
+def get_stages():
+    """
+    :return: copy of the measurements of every stage recorded so far
+    """
+    return {name: dict(measurements) for name, measurements in stages.items()}
+
+
+def merge(other_stages):
+    """
+    Adds measurements made elsewhere (like in another process) to this process's
+    """
+    for name, other in other_stages.items():
+        if name not in stages:
+            stages[name] = dict(other)
+            continue
+        measurements = stages[name]
+        measurements['calls'] += other['calls']
+        measurements['seconds'] += other['seconds']
+        measurements['max_seconds'] = max(measurements['max_seconds'], other['max_seconds'])
+        measurements['max_rss_mb'] = max(measurements['max_rss_mb'], other['max_rss_mb'])
+        # Each process has its own peak, so growths in different processes add up
+        measurements['max_rss_growth_mb'] += other['max_rss_growth_mb']
+
+
+def write_trace(path):
+    trace = {
+        'created': datetime.datetime.now().isoformat(),
+        'stages': get_stages()
+    }
+    with open(path, 'w') as trace_file:
+        json.dump(trace, trace_file, indent=2, sort_keys=True)
@@ -0,0 +1,84 @@
+from clearn import clearn_path
+from clearn import instrument
+from clearn import munge
+import json
+import os
+import tempfile
+import unittest
+
+
+@instrument.timed('test.add')
+def add(first, second):
+    return first + second
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        instrument.reset()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_disabled(self):
+        # Nothing shall be recorded while instrumentation is disabled
+        with instrument.stage('test.stage'):
+            pass
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(instrument.get_stages(), {})
+
+    def test_enabled(self):
+        instrument.enable()
+        for _ in range(3):
+            with instrument.stage('test.stage'):
+                pass
+        self.assertEqual(add(1, 2), 3)
+
+        stages = instrument.get_stages()
+        self.assertEqual(stages['test.stage']['calls'], 3)
+        self.assertEqual(stages['test.add']['calls'], 1)
+        self.assertGreaterEqual(stages['test.stage']['seconds'], stages['test.stage']['max_seconds'])
+        self.assertGreater(stages['test.add']['max_rss_mb'], 0)
+        self.assertGreaterEqual(stages['test.add']['max_rss_growth_mb'], 0)
+
+    def test_max_rss_growth(self):
+        # A stage that started with the peak 10 MB lower raised it by (at least) 10 MB
+        instrument.record('test.grew', 1.0, instrument.get_max_rss_mb() - 10)
+        # while one that started with the peak where it is now didn't raise it at all
+        instrument.enable()
+        with instrument.stage('test.nothing'):
+            pass
+        stages = instrument.get_stages()
+        self.assertGreaterEqual(stages['test.grew']['max_rss_growth_mb'], 10)
+        self.assertEqual(stages['test.nothing']['max_rss_growth_mb'], 0)
+
+    def test_chunk_reads(self):
+        # Streaming parses the csv a chunk at a time, and every chunk's parsing shall be timed
+        instrument.enable()
+        munge.count_crimes_in_chunks(clearn_path('data/fixtures/mediumCrimeSample.csv'), 1000)
+        stages = instrument.get_stages()
+        self.assertGreater(stages['munge.read_crimes_csv.chunk']['calls'], 1)
+
+    def test_merge(self):
+        instrument.enable()
+        with instrument.stage('test.stage'):
+            pass
+        instrument.merge({'test.stage': {'calls': 2, 'seconds': 5.0, 'max_seconds': 4.0, 'max_rss_mb': 1.0,
+                                         'max_rss_growth_mb': 1.0},
+                          'test.other': {'calls': 1, 'seconds': 1.0, 'max_seconds': 1.0, 'max_rss_mb': 1.0,
+                                         'max_rss_growth_mb': 0.0}})
+        stages = instrument.get_stages()
+        self.assertEqual(stages['test.stage']['calls'], 3)
+        self.assertEqual(stages['test.stage']['max_seconds'], 4.0)
+        self.assertEqual(stages['test.other']['calls'], 1)
+
+    def test_write_trace(self):
+        instrument.enable()
+        add(1, 2)
+        descriptor, path = tempfile.mkstemp(suffix='.json')
+        os.close(descriptor)
+        instrument.write_trace(path)
+        with open(path) as trace_file:
+            trace = json.load(trace_file)
+        os.remove(path)
+        self.assertEqual(trace['stages']['test.add']['calls'], 1)
@@ -0,0 +1,98 @@
+"""
+On-disk store of fitted models, so that predictors can pick up where earlier runs left off.
+
+Each entry holds a fitted model for one predictor in one community area, along with the schema it was fitted with
+(the feature columns and model settings) and whatever the predictor needs to tell if the fit is still good.
+Entries are only read from disk when they're first asked for, and an entry whose schema doesn't match
+the schema it's asked for is thrown away.
+
+SequentialPredictor trains new HMMs on every 30 day window, so its warm start is the store's vote cache instead
+(see hmm.VoteCache), whose keys already hold every setting the votes depend on.
+"""
+import os
+import pickle
+from clearn import clearn_path
+from clearn import hmm
+
+MODELS_PATH = clearn_path('data/models')
+
+
+class ModelStore():
+
+    def __init__(self, path=MODELS_PATH):
+        self.path = path
+        # Entries already read from (or written to) disk, keyed by (predictor name, area)
+        self.entries = {}
+        self.vote_cache = None
+
+    def __getstate__(self):
+        # Processes that receive a copy of the store read entries from disk for themselves
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def get(self, predictor_name, area, schema):
+        """
+        :return: dict stored for predictor_name in area, or None if there isn't one fitted with schema
+        """
+        key = (predictor_name, area)
+        if key not in self.entries:
+            self.entries[key] = self.read_entry(predictor_name, area)
+
+        entry = self.entries[key]
+        if entry is None:
+            return None
+        if entry['schema'] != schema:
+            # Features or settings have changed since this model was fitted
+            self.invalidate(predictor_name, area)
+            return None
+        return entry
+
+    def put(self, predictor_name, area, schema, **fields):
+        """
+        Stores fields (like the fitted model) for predictor_name in area, fitted with schema
+        """
+        entry = dict(fields, schema=schema)
+        path = self.get_entry_path(predictor_name, area)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Write to a temporary file and swap it in, so a crash never leaves half an entry
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as entry_file:
+            pickle.dump(entry, entry_file)
+        os.replace(temp_path, path)
+        self.entries[(predictor_name, area)] = entry
+
+    def invalidate(self, predictor_name, area):
+        self.entries[(predictor_name, area)] = None
+        try:
+            os.remove(self.get_entry_path(predictor_name, area))
+        except OSError:
+            pass
+
+    def read_entry(self, predictor_name, area):
+        try:
+            with open(self.get_entry_path(predictor_name, area), 'rb') as entry_file:
+                return pickle.load(entry_file)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def get_entry_path(self, predictor_name, area):
+        return os.path.join(self.path, predictor_name, area + '.pickle')
+
+    def get_vote_cache(self):
+        """
+        :return: hmm.VoteCache kept in this store, for SequentialPredictor's vote_cache
+        """
+        if self.vote_cache is None:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            self.vote_cache = hmm.VoteCache(path=os.path.join(self.path, 'votes'))
+        return self.vote_cache
+
+    def close(self):
+        if self.vote_cache is not None:
+            self.vote_cache.close()
+            self.vote_cache = None
@@ -0,0 +1,102 @@
+from clearn import models
+from clearn import predict
+import numpy as np
+import pandas as pd
+from sklearn import linear_model
+import shutil
+import tempfile
+import unittest
+
+
+def make_time_series(num_days=120, random_state=0):
+    random = np.random.RandomState(random_state)
+    index = pd.date_range('2010-01-01', periods=num_days)
+    return pd.DataFrame({'Violent Crimes': random.randint(0, 4, num_days),
+                         'Violent Crimes in Last Week': random.randint(0, 20, num_days),
+                         'Violent Crime Committed?': random.randint(0, 2, num_days).astype(bool)},
+                        index=index)
+
+
+class TestModelStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_round_trip(self):
+        models.ModelStore(self.path).put('predictor', 'Edgewater', ('a', 'b'), model=[1, 2], num_days_trained=3)
+        # A fresh store only reads the entry from disk when it's asked for
+        store = models.ModelStore(self.path)
+        self.assertEqual(store.entries, {})
+        entry = store.get('predictor', 'Edgewater', ('a', 'b'))
+        self.assertEqual(entry['model'], [1, 2])
+        self.assertEqual(entry['num_days_trained'], 3)
+
+    def test_missing(self):
+        self.assertIsNone(models.ModelStore(self.path).get('predictor', 'Edgewater', ('a', 'b')))
+
+    def test_schema_change_invalidates(self):
+        models.ModelStore(self.path).put('predictor', 'Edgewater', ('a', 'b'), model=[1, 2])
+        self.assertIsNone(models.ModelStore(self.path).get('predictor', 'Edgewater', ('a', 'c')))
+        # The stale entry is gone for good
+        self.assertIsNone(models.ModelStore(self.path).get('predictor', 'Edgewater', ('a', 'b')))
+
+
+class TestNonsequentialWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.time_series = make_time_series()
+        self.days = list(self.time_series.index[-10:])
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def make_predictor(self, time_series=None, **options):
+        return predict.NonsequentialPredictor(self.time_series if time_series is None else time_series,
+                                              model_store=models.ModelStore(self.path), model_key='Edgewater',
+                                              **options)
+
+    def test_reuses_fit(self):
+        expected = self.make_predictor(retrain_interval=100).predict_many(self.days)
+
+        predictor = self.make_predictor(retrain_interval=100)
+        predictor.model.fit = None  # Fails if called
+        np.testing.assert_array_equal(predictor.predict_many(self.days), expected)
+
+    def test_refits_on_revised_data(self):
+        self.make_predictor(retrain_interval=100).predict_many(self.days)
+
+        revised = self.time_series.copy()
+        revised.iloc[0, 0] += 1
+        predictor = self.make_predictor(revised, retrain_interval=100)
+        self.assertFalse(predictor.load_fit(len(revised) - 10))
+
+    def test_refits_on_new_schema(self):
+        self.make_predictor(retrain_interval=100).predict_many(self.days)
+        predictor = self.make_predictor(retrain_interval=100)
+        predictor.model.set_params(C=0.5)
+        self.assertFalse(predictor.load_fit(len(self.time_series) - 10))
+
+    def test_incremental_continues_from_stored_fit(self):
+        self.make_predictor(model=linear_model.SGDClassifier(random_state=0), incremental=True).predict_many(
+            self.days[:5])
+
+        predictor = self.make_predictor(model=linear_model.SGDClassifier(random_state=0), incremental=True)
+        # The last of the first five days was the last one trained through
+        self.assertTrue(predictor.load_fit(len(self.time_series) - 1))
+        self.assertEqual(predictor.num_days_trained, len(self.time_series) - 6)
+        predictor.train_incrementally(len(self.time_series) - 1)
+        self.assertEqual(predictor.num_days_trained, len(self.time_series) - 1)
+
+    def test_predict_all_stores_every_area(self):
+        time_series_dict = {'Edgewater': self.time_series, 'Uptown': make_time_series(random_state=1)}
+        store = models.ModelStore(self.path)
+        predict.NonsequentialPredictor.predict_all(time_series_dict, self.days[-1:], model_store=store)
+        for area in time_series_dict:
+            self.assertIsNotNone(models.ModelStore(self.path).get(
+                'NonsequentialPredictor', area, predict.NonsequentialPredictor(time_series_dict[area]).get_schema()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,27 +1,67 @@
 import pandas as pd
+import numpy as np
 from datetime import date
 import csv
 import pickle
+import warnings
+from functools import lru_cache
 from clearn import clearn_path
+from clearn import instrument
+from clearn import store
 
 
+STORE_PATH = clearn_path('data/masterDictionary')
 PICKLE_PATH = clearn_path('data/masterDictionary.pickle')
 
+# The data portal's export has 22 columns. These are the only ones we use.
+CSV_COLUMNS = ['Date', 'Primary Type', 'Community Area', 'Arrest', 'Domestic']
+CSV_DTYPES = {
+    'Date': object,
+    'Primary Type': object,
+    # Community area numbers are floats in the export, and some are missing
+    'Community Area': np.float32,
+    'Arrest': bool,
+    'Domestic': bool
+}
+
+# The data portal writes every timestamp like 02/27/2015 11:58:00 PM
+TIMESTAMP_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+DATE_FORMAT = '%m/%d/%Y'
+
+# Number of crime records read from the csv at a time when streaming
+CHUNK_SIZE = 100000
+
+# Every time series begins on this day
+FIRST_DAY = date(2001, 1, 1)
+
+# Bins that crime_bins.csv sorts each Primary Type into
+SEVERITY_LABELS = ['Violent', 'Severe', 'Minor', 'Petty']
+
+# Columns of each community area's time series that hold counts summed over each day
+COUNT_COLUMNS = ['Arrest', 'Domestic'] + [label + ' Crimes' for label in SEVERITY_LABELS]
+
 
 def get_master_dict():
     """
     Returns master_dict saved to file if it is available.
+
+    Prefers the memory-mapped columnar store in data/masterDictionary,
+    whose data frames are only read from disk when they are looked up.
+    Falls back to data/masterDictionary.pickle.
     """
+    master_dict = store.open_store(STORE_PATH)
+    if master_dict is not None:
+        return master_dict
     try:
         with open(PICKLE_PATH, 'rb') as file:
             return pickle.load(file)
     except IOError:
-        print('Unable to open pickled master dictionary. Make sure data/masterDictionary.pickle exists. '
+        print('Unable to open master dictionary. Make sure data/masterDictionary or data/masterDictionary.pickle exists. '
               'If not, run initialize_master_dict.py from the repository root.')
         return None
 
 
-def init_master_dict(csv_path):
+def init_master_dict(csv_path, chunksize=CHUNK_SIZE):
     """
     Creates dictionary mapping each community area name and the city of chicago (key='Chicago')
     to pandas dataframes. THe dataframes are indexed by day and have the following columns:
@@ -30,75 +70,213 @@ def init_master_dict(csv_path):
 
     Persists master_dict to file.
     """
-    master_dict = make_master_dict(csv_path)
+    master_dict = make_master_dict(csv_path, chunksize=chunksize)
+    persist_master_dict(master_dict)
+
+
+def update_master_dict(csv_path, chunksize=CHUNK_SIZE):
+    """
+    Folds the crimes in csv_path into the persisted master_dict and persists the result.
+
+    csv_path only needs to hold the new or updated records, but it must hold every record
+    for each day it covers: those days are recounted from scratch in every community area and in Chicago.
+    Every time series is extended to the latest day in either the master_dict or csv_path.
+    """
+    master_dict = get_master_dict()
+    if master_dict is None:
+        raise IOError('No master dictionary to update at ' + STORE_PATH)
+    counts = count_crimes_in_chunks(csv_path, chunksize)
+    master_dict = append_to_master_dict(master_dict, counts)
     persist_master_dict(master_dict)
+    return master_dict
+
 
+def make_master_dict(csv_path, chunksize=None):
+    """
+    Builds master_dict (as described in init_master_dict) from the crimes csv at csv_path.
+
+    If chunksize is given, the csv is streamed chunksize records at a time
+    and each chunk is folded into per-area daily counts before the next one is read,
+    so memory use doesn't grow with the size of the csv.
+    """
+    if chunksize is not None:
+        return make_master_dict_from_chunks(csv_path, chunksize)
 
-def make_master_dict(csv_path):
     # Transform csv to Pandas data frame
-    data_frame = pd.read_csv(csv_path)
-    # Drop unnecessary columns and reindex crimes by date
-    timestamps = make_clean_timestamps(data_frame)
-    # Timestamps are ordered latest to earliest (new crimes on top)
-    latest_day = timestamps.index[0]
-    # From crime timestamps, create dictionary mapping community area names
-    #   to pandas data frames resampled by day
-    days_by_area = get_days_by_area(timestamps, latest_day)
-    # Add an extra mapping to include what happened in all of Chicago on each day
-    days_by_area['Chicago'] = make_series_of_days_from_timestamps(timestamps, latest_day)
-    return days_by_area
+    data_frame = read_crimes_csv(csv_path)
+    # Drop unnecessary columns and reindex crimes by day
+    days = make_clean_days(data_frame)
+    # Count crimes in every community area on every day in one pass
+    counts = count_by_area_and_day(days, days.index.max())
+    # From the counts, create dictionary mapping community area names (and 'Chicago')
+    #   to pandas data frames indexed by day
+    return make_master_dict_from_counts(counts)
+
+
+@instrument.timed('munge.read_crimes_csv')
+def read_crimes_csv(csv_path, chunksize=None):
+    """
+    Reads only the columns we use from the crimes csv.
+    If chunksize is given, returns an iterator over data frames of at most chunksize records.
+    """
+    return pd.read_csv(csv_path, usecols=CSV_COLUMNS, dtype=CSV_DTYPES, chunksize=chunksize)
 
 
+@instrument.timed('munge.persist_master_dict')
 def persist_master_dict(master_dict):
-    with open(PICKLE_PATH, 'wb') as file:
-        pickle.dump(master_dict, file, protocol=pickle.HIGHEST_PROTOCOL)
+    store.write_store(master_dict, STORE_PATH)
+
+
+def export_master_dict(master_dict, pickle_path=PICKLE_PATH):
+    """
+    Pickles master_dict as a plain dict of data frames, e.g. to share it with someone without the store.
+    """
+    with open(pickle_path, 'wb') as file:
+        pickle.dump(dict(master_dict), file, protocol=pickle.HIGHEST_PROTOCOL)
 
 """ Used in make_clean_timestamps() """
 
 
+@instrument.timed('munge.make_clean_timestamps')
 def make_clean_timestamps(data_frame):
-    data_frame = drop_all_columns_but(data_frame, ['Date', 'Primary Type', 'Community Area', 'Arrest', 'Domestic'])
-    data_frame = convert_comm_area_nums_to_names(data_frame)
-    data_frame = transform_from_csv(data_frame, 'Primary Type', clearn_path('config/crime_bins.csv'))
+    data_frame = clean_columns(data_frame)
     timestamps = reindex_by_date(data_frame)
     timestamps = make_cols_categorical(timestamps, ['Primary Type', 'Community Area'])
     return timestamps
 
 
+@instrument.timed('munge.make_clean_days')
+def make_clean_days(data_frame):
+    """
+    Like make_clean_timestamps, but indexes crimes by day number (days since Jan 1, 2001)
+    instead of by timestamp. That's all the resolution we need to count crimes by day.
+    """
+    data_frame = clean_columns(data_frame)
+    days = reindex_by_day_number(data_frame)
+    days = make_cols_categorical(days, ['Primary Type', 'Community Area'])
+    return days
+
+
+def clean_columns(data_frame):
+    data_frame = drop_all_columns_but(data_frame, CSV_COLUMNS)
+    data_frame = convert_comm_area_nums_to_names(data_frame)
+    data_frame = transform_from_csv(data_frame, 'Primary Type', clearn_path('config/crime_bins.csv'))
+    return data_frame
+
+
 def drop_all_columns_but(data_frame, columns):
     return data_frame.reindex(columns=columns)
 
 
 def convert_comm_area_nums_to_names(data_frame):
     # Replace floats with ints. If no translation, mark it as 0 (an invalid community number)
-    def clean_comm_area_value(val):
-        try:
-            return int(val)
-        except ValueError:
-            return 0
-    data_frame['Community Area'] = data_frame['Community Area'].map(clean_comm_area_value)
+    numbers = translate(data_frame['Community Area'], clean_comm_area_value, 0, dtype=np.int64)
     # Remove rows with invalid community area numbers
-    data_frame = data_frame[data_frame['Community Area'] > 0]
-    # Convert numbers to strings for easy binning
-    data_frame['Community Area'] = data_frame['Community Area'].map(lambda num: str(int(num)))
-    data_frame = transform_from_csv(data_frame, 'Community Area', clearn_path('config/community_areas.csv'))
+    names_by_number = get_community_area_table()
+    is_valid = (numbers > 0) & (numbers < len(names_by_number))
+    data_frame = data_frame[is_valid].copy()
+    # Look up every name at once from the table of names indexed by number
+    data_frame['Community Area'] = names_by_number[numbers[is_valid]]
     return data_frame
 
 
-def transform_from_csv(data_frame, col_name, csv_name):
-    with open(csv_name, 'r') as file:
-        unbinned_to_binned = {}
-        reader = csv.reader(file)
-        for line in reader:
-            unbinned_to_binned[line[0]] = line[1]
+def clean_comm_area_value(val):
+    try:
+        return int(val)
+    except (ValueError, TypeError):
+        return 0
 
-    data_frame[col_name] = data_frame[col_name].map(lambda unbinned: unbinned_to_binned[unbinned])
+
+def transform_from_csv(data_frame, col_name, csv_name):
+    """
+    Replaces each value in data_frame[col_name] with its translation in the two column csv at csv_name.
+    Rows whose value has no translation are dropped with a warning.
+    """
+    unbinned_to_binned = read_translation_csv(csv_name)
+    binned = translate(data_frame[col_name], unbinned_to_binned.get, None)
+
+    has_translation = ~pd.isnull(binned)
+    if not has_translation.all():
+        untranslated = set(np.asarray(data_frame[col_name])[~has_translation])
+        warnings.warn('Dropping {} rows with no translation in {}: {}'.format(
+            (~has_translation).sum(), csv_name, ', '.join(sorted(str(value) for value in untranslated))))
+        data_frame = data_frame[has_translation].copy()
+        binned = binned[has_translation]
+
+    data_frame[col_name] = binned
     return data_frame
 
 
+def translate(values, lookup, default, dtype=object):
+    """
+    Applies lookup to each distinct value in values only once, and spreads the results back over every row.
+
+    :param values: list-like of hashable values
+    :param lookup: function taking one value to its translation
+    :param default: translation of missing (NaN) values
+    :param dtype: numpy dtype of the translations
+    :return: numpy array holding the translation of each of values
+    """
+    if isinstance(values, pd.Series) and str(values.dtype) == 'category':
+        # Categorical columns are already integer-coded
+        codes, uniques = np.asarray(values.cat.codes), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(np.asarray(values))
+    # Missing values have code -1, which picks out the default at the end
+    table = np.empty(len(uniques) + 1, dtype=dtype)
+    table[:] = [lookup(unique) for unique in uniques] + [default]
+    return table[codes]
+
+
+@lru_cache(maxsize=None)
+def read_translation_csv(csv_name):
+    """
+    :return: dict mapping the first column of the csv at csv_name to its second column. Read from disk once.
+    """
+    with open(csv_name, 'r') as file:
+        return {line[0]: line[1] for line in csv.reader(file)}
+
+
 def reindex_by_date(data_frame):
-    data_frame.index = pd.to_datetime(data_frame['Date'])
-    return data_frame.drop('Date', 1)
+    data_frame.index = parse_timestamps(data_frame['Date'])
+    return data_frame.drop('Date', axis=1)
+
+
+def reindex_by_day_number(data_frame):
+    data_frame.index = parse_day_numbers(data_frame['Date'])
+    return data_frame.drop('Date', axis=1)
+
+
+def parse_timestamps(strings):
+    """
+    Parses each distinct string in strings only once, expecting the data portal's TIMESTAMP_FORMAT.
+    :return: pandas DatetimeIndex with a timestamp for each of strings
+    """
+    codes, uniques = pd.factorize(np.asarray(strings))
+    parsed = to_datetime_with_format(uniques, TIMESTAMP_FORMAT)
+    # Missing strings have code -1, which picks out the NaT at the end
+    return pd.DatetimeIndex(np.append(parsed.values, np.datetime64('NaT'))[codes])
+
+
+def parse_day_numbers(strings):
+    """
+    Parses only the date of each distinct string in strings, expecting the data portal's TIMESTAMP_FORMAT.
+    :return: numpy array with the number of days from Jan 1, 2001 to each of strings (-1 where a string is missing)
+    """
+    codes, uniques = pd.factorize(np.asarray(strings))
+    # Many timestamps share a date, so parse each date once too
+    dates = np.array([unique[:len('mm/dd/yyyy')] for unique in uniques], dtype=object)
+    date_codes, unique_dates = pd.factorize(dates)
+    numbers = day_numbers(to_datetime_with_format(unique_dates, DATE_FORMAT))
+    return np.append(numbers[date_codes], -1)[codes]
+
+
+def to_datetime_with_format(strings, date_format):
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(strings, format=date_format))
+    except ValueError:
+        # Not from the data portal. Let pandas work out the format, slowly.
+        return pd.DatetimeIndex(pd.to_datetime(strings))
 
 
 def make_cols_categorical(data_frame, col_names):
@@ -111,48 +289,248 @@ def make_cols_categorical(data_frame, col_names):
 
 
 def get_days_by_area(timestamps, latest_day):
-    days_by_area = {}
-    grouped = timestamps.groupby('Community Area')
-    for name, frame in grouped:
-        area_days = make_series_of_days_from_timestamps(frame, latest_day)
-        area_days['Violent Crime Committed?'] = area_days['Violent Crimes'].map(lambda num_crimes: num_crimes > 0)
-        area_days = extract_time_features(area_days)
-        days_by_area[name] = area_days
+    counts = count_by_area_and_day(timestamps, latest_day)
+    days_by_area = make_master_dict_from_counts(counts)
+    del days_by_area['Chicago']
     return days_by_area
 
 
-def extract_time_features(days):
-    days['Month'] = days.index.map(lambda stamp: stamp.month)
-    days['Weekday'] = days.index.map(lambda stamp: stamp.weekday())
-    days = make_cols_categorical(days, ['Month', 'Weekday'])
+@instrument.timed('munge.extract_time_features')
+def extract_time_features(days, time_features=None):
+    """
+    Adds the categorical Month and Weekday columns to days.
+
+    :param time_features: data frame from make_time_features(days.index), to share between areas on the same days
+    """
+    if time_features is None:
+        time_features = make_time_features(days.index)
+    days['Month'] = time_features['Month']
+    days['Weekday'] = time_features['Weekday']
     return days
 
-""" Used in make_series_of_days_from_timestamps() """
+
+def make_time_features(index):
+    """
+    :return: data frame of the categorical Month and Weekday of each day in index
+    """
+    time_features = pd.DataFrame({'Month': np.asarray(index.month), 'Weekday': np.asarray(index.weekday)},
+                                 index=index, columns=['Month', 'Weekday'])
+    return make_cols_categorical(time_features, ['Month', 'Weekday'])
 
 
 def make_series_of_days_from_timestamps(timestamps, latest_day):
-    timestamps = extract_severity_counts(timestamps)
-    days = resample_by_day(timestamps, latest_day)
-    return days
+    """
+    Sums the counted columns of every crime in timestamps over each day from Jan 1, 2001 to latest_day.
+    """
+    counts = count_by_area_and_day(timestamps, latest_day)
+    return pd.DataFrame(counts.sum(axis=0), index=make_common_index(counts.shape[1]), columns=COUNT_COLUMNS)
 
 
-def extract_severity_counts(timestamps):
-    for label in ['Violent', 'Severe', 'Minor', 'Petty']:
-        timestamps[label + ' Crimes'] = [int(classification == label) for classification in timestamps['Primary Type']]
-    return timestamps
+""" Used in count_by_area_and_day() """
+
+
+@instrument.timed('munge.count_by_area_and_day')
+def count_by_area_and_day(timestamps, latest_day):
+    """
+    Bins every crime in timestamps by (community area, day, severity) in a single pass.
+    timestamps may be indexed by timestamp (see make_clean_timestamps) or by day number (see make_clean_days).
+
+    Returns a numpy array counts where counts[a, d, c] is the sum of COUNT_COLUMNS[c] over the crimes
+        committed in the a-th community area (see get_community_area_names) on the d-th day since Jan 1, 2001.
+    The array covers every day through latest_day. Crimes committed after latest_day are dropped.
+    """
+    area_names = get_community_area_names()
+    num_areas = len(area_names)
+    num_days = day_number(latest_day) + 1
+
+    area_codes = codes_in(timestamps['Community Area'], area_names)
+    severity_codes = codes_in(timestamps['Primary Type'], SEVERITY_LABELS)
+    day_codes = day_numbers(timestamps.index)
+    in_range = (area_codes >= 0) & (severity_codes >= 0) & (day_codes >= 0) & (day_codes < num_days)
+
+    # Give every (area, day) pair its own cell, and add each crime to its cell
+    cells = area_codes[in_range] * num_days + day_codes[in_range]
+    num_cells = num_areas * num_days
+    counts = np.empty((num_cells, len(COUNT_COLUMNS)))
+    for column, name in enumerate(['Arrest', 'Domestic']):
+        weights = np.asarray(timestamps[name], dtype=np.float64)[in_range]
+        counts[:, column] = np.bincount(cells, weights=weights, minlength=num_cells)
+    # Every crime has exactly one severity, so count them all at once with a cell for each (area, day, severity)
+    num_labels = len(SEVERITY_LABELS)
+    severity_cells = cells * num_labels + severity_codes[in_range]
+    counts[:, 2:] = np.bincount(severity_cells, minlength=num_cells * num_labels).reshape(num_cells, num_labels)
+
+    return counts.reshape(num_areas, num_days, len(COUNT_COLUMNS))
+
+
+@lru_cache(maxsize=None)
+def get_community_area_names():
+    """
+    :return: tuple of community area names ordered by community area number
+    """
+    number_to_name = read_translation_csv(clearn_path('config/community_areas.csv'))
+    return tuple(number_to_name[number] for number in sorted(number_to_name, key=int))
+
+
+@lru_cache(maxsize=None)
+def get_community_area_table():
+    """
+    :return: numpy array whose element at each community area number is that area's name.
+        Elements at numbers that aren't community areas (like 0) are None.
+    """
+    number_to_name = read_translation_csv(clearn_path('config/community_areas.csv'))
+    table = np.empty(max(int(number) for number in number_to_name) + 1, dtype=object)
+    for number, name in number_to_name.items():
+        table[int(number)] = name
+    # Nobody should be able to change the cached table
+    table.flags.writeable = False
+    return table
+
+
+def codes_in(values, labels):
+    """
+    :return: numpy array with the position of each of values in labels, or -1 where a value isn't in labels
+    """
+    positions = {label: position for position, label in enumerate(labels)}
+    return translate(values, lambda value: positions.get(value, -1), -1, dtype=np.int64)
+
+
+def day_number(day):
+    """
+    :return: number of days from Jan 1, 2001 to day
+    """
+    if isinstance(day, (int, np.integer)):
+        # Already a day number
+        return int(day)
+    return (pd.Timestamp(day).normalize() - pd.Timestamp(FIRST_DAY)).days
 
 
-def resample_by_day(timestamps, latest_day):
-    # Compress all timestamps in a day to a single row representing the entire day.
-    #   Sum over the column values of each individual timestamp (for bools, True is 1, False is 0)
-    days = timestamps.resample('D', how='sum')
+def day_numbers(index):
+    """
+    :return: numpy array with the number of days from Jan 1, 2001 to each timestamp in index
+    """
+    if np.issubdtype(index.dtype, np.integer):
+        # Already day numbers
+        return np.asarray(index, dtype=np.int64)
+    days = np.asarray(index.values, dtype='datetime64[D]')
+    return (days - np.datetime64(FIRST_DAY.isoformat())).astype(np.int64)
+
 
+def make_common_index(num_days):
     # Every time series should begin and end on the same day
-    common_index = pd.date_range(date(2001, 1, 1), latest_day)
-    days = days.reindex(index=common_index)
+    return pd.date_range(FIRST_DAY, periods=num_days)
+
+
+@instrument.timed('munge.make_master_dict_from_counts')
+def make_master_dict_from_counts(counts):
+    """
+    Given counts as returned by count_by_area_and_day, makes master_dict (as described in init_master_dict).
+    """
+    index = make_common_index(counts.shape[1])
+    # Every area has the same days, so work out their months and weekdays once
+    time_features = make_time_features(index)
+    days_by_area = {area: make_area_days(area_counts, index, time_features)
+                    for area, area_counts in zip(get_community_area_names(), counts)}
+    # Every crime with a valid community area counts toward the whole city
+    days_by_area['Chicago'] = pd.DataFrame(counts.sum(axis=0), index=index, columns=COUNT_COLUMNS)
+    return days_by_area
+
+
+def make_area_days(area_counts, index, time_features=None):
+    area_days = pd.DataFrame(area_counts, index=index, columns=COUNT_COLUMNS)
+    area_days['Violent Crime Committed?'] = area_counts[:, COUNT_COLUMNS.index('Violent Crimes')] > 0
+    return extract_time_features(area_days, time_features)
+
+
+""" Used in make_master_dict_from_chunks() """
+
 
-    # For days that didn't have any crimes, pandas will fill their fields with N/A by default.
-    # Replace every instance of N/A with 0
-    days = days.fillna(0)
+def make_master_dict_from_chunks(csv_path, chunksize):
+    return make_master_dict_from_counts(count_crimes_in_chunks(csv_path, chunksize))
 
-    return days
\ No newline at end of file
+
+@instrument.timed('munge.count_crimes_in_chunks')
+def count_crimes_in_chunks(csv_path, chunksize):
+    """
+    Streams the crimes csv at csv_path and returns counts as described in count_by_area_and_day,
+        through the latest day with a crime.
+    """
+    counts = None
+    reader = read_crimes_csv(csv_path, chunksize=chunksize)
+    while True:
+        # The reader only parses the csv as each chunk is asked for, so time that instead of making the reader
+        with instrument.stage('munge.read_crimes_csv.chunk'):
+            chunk = next(reader, None)
+        if chunk is None:
+            break
+        days = make_clean_days(chunk)
+        if len(days) == 0:
+            continue
+        # Fold this chunk's crimes into the running per-area daily totals.
+        #   Unlike the full export, a chunk isn't guaranteed to start with the latest crime.
+        chunk_counts = count_by_area_and_day(days, days.index.max())
+        counts = chunk_counts if counts is None else add_counts(counts, chunk_counts)
+
+    if counts is None:
+        raise ValueError('No crimes with a valid community area in ' + csv_path)
+
+    return counts
+
+
+def add_counts(counts, more_counts):
+    # Pad the shorter of the two arrays with empty days
+    if more_counts.shape[1] > counts.shape[1]:
+        counts, more_counts = more_counts, counts
+    counts[:, :more_counts.shape[1]] += more_counts
+    return counts
+
+
+""" Used in update_master_dict() """
+
+
+@instrument.timed('munge.append_to_master_dict')
+def append_to_master_dict(master_dict, counts):
+    """
+    Returns a new master_dict where every day with a crime in counts (as returned by count_by_area_and_day)
+    has been recounted from counts alone, and every time series extends through the later of its last day
+    and the last day in counts.
+
+    Areas whose days all stay the same keep their old data frames. The rest are rebuilt from their counts,
+    sharing one set of time features.
+    """
+    num_days = max(len(master_dict['Chicago']), counts.shape[1])
+    index = make_common_index(num_days)
+    time_features = None
+    # Each crime has one severity, so a day has crimes if any severity was counted on it
+    updated_days = counts[:, :, 2:].sum(axis=(0, 2)) > 0
+
+    updated_dict = {}
+    for area, area_counts in zip(get_community_area_names(), counts):
+        if area in master_dict:
+            old_days = master_dict[area]
+            old_counts = old_days[COUNT_COLUMNS].values
+            if len(old_days) == num_days and \
+                    np.array_equal(old_counts[:len(updated_days)][updated_days], area_counts[updated_days]):
+                # Recounting changes nothing here
+                updated_dict[area] = old_days
+                continue
+        else:
+            old_counts = np.zeros((0, len(COUNT_COLUMNS)))
+        if time_features is None:
+            time_features = make_time_features(index)
+        updated_dict[area] = make_area_days(recount_days(old_counts, area_counts, updated_days, num_days), index,
+                                            time_features)
+
+    chicago_counts = recount_days(master_dict['Chicago'][COUNT_COLUMNS].values, counts.sum(axis=0),
+                                  updated_days, num_days)
+    updated_dict['Chicago'] = pd.DataFrame(chicago_counts, index=index, columns=COUNT_COLUMNS)
+    return updated_dict
+
+
+def recount_days(old_counts, new_counts, updated_days, num_days):
+    days = np.zeros((num_days, len(COUNT_COLUMNS)))
+    days[:len(old_counts)] = old_counts
+    # Updated days are recounted from scratch, so forget what we knew about them
+    recounted = days[:len(updated_days)]
+    recounted[updated_days] = new_counts[updated_days]
+    return days
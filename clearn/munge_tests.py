@@ -1,6 +1,7 @@
 import unittest
 import csv
 import pandas as pd
+import numpy as np
 from clearn import munge
 from clearn import clearn_path
 from datetime import date
@@ -44,11 +45,12 @@ class TestTimestampCreation(unittest.TestCase):
             'Domestic': True
         })
 
-        # As implemented now, raises a KeyError
-        #   But that's an implementation detail.
-        #   As long as it raises an exception, I'm happy.
-        with self.assertRaises(Exception):
-            munge.make_clean_timestamps(weird_crimes)
+        # Crimes we don't know how to bin shall be dropped with a warning
+        #   rather than bringing down the whole ingest.
+        weird_crimes['Date'] = '02/27/2015 11:58:00 PM'
+        with self.assertWarns(UserWarning):
+            timestamps = munge.make_clean_timestamps(weird_crimes)
+        self.assertEqual(len(timestamps), 0)
 
     def test_known_sample(self):
         # Take first five crimes from small sample
@@ -175,4 +177,127 @@ class TestMasterDict(unittest.TestCase):
     def test_each_time_series_has_correct_length(self):
         correct_length = len(pd.date_range(date(2001, 1, 1), date(2015, 3, 13)))
         lengths = [len(time_series) for time_series in self.master_dict.values()]
-        self.assertTrue(all([length == correct_length for length in lengths]), str(lengths))
\ No newline at end of file
+        self.assertTrue(all([length == correct_length for length in lengths]), str(lengths))
+
+class TestStreamingMasterDict(unittest.TestCase):
+    def setUp(self):
+        fixture_path = clearn_path('data/fixtures/mediumCrimeSample.csv')
+        self.master_dict = munge.make_master_dict(fixture_path)
+        # Use a chunk size that doesn't divide the fixture evenly
+        self.streamed_dict = munge.make_master_dict(fixture_path, chunksize=777)
+
+    def test_same_keys(self):
+        self.assertEqual(set(self.master_dict.keys()), set(self.streamed_dict.keys()))
+
+    def test_same_counts(self):
+        # Streaming shall produce the same daily counts as reading the whole csv at once
+        for area, frame in self.master_dict.items():
+            streamed_frame = self.streamed_dict[area]
+            self.assertTrue((frame.index == streamed_frame.index).all(), 'Failed on ' + area)
+            for column in munge.COUNT_COLUMNS:
+                self.assertTrue((frame[column].values == streamed_frame[column].values).all(),
+                                'Failed on ' + area + ', ' + column)
+
+
+class TestAppendToMasterDict(unittest.TestCase):
+    def setUp(self):
+        fixture_path = clearn_path('data/fixtures/mediumCrimeSample.csv')
+        self.master_dict = munge.make_master_dict(fixture_path, chunksize=1000)
+
+        # Split the fixture into everything before its last day and the records of its last day
+        timestamps = munge.make_clean_timestamps(munge.read_crimes_csv(fixture_path))
+        last_day = timestamps.index.max().normalize()
+        earlier = timestamps[timestamps.index < last_day]
+        latest = timestamps[timestamps.index >= last_day]
+
+        earlier_dict = munge.make_master_dict_from_counts(munge.count_by_area_and_day(earlier, earlier.index.max()))
+        self.appended_dict = munge.append_to_master_dict(earlier_dict, munge.count_by_area_and_day(latest, last_day))
+
+    def test_same_as_full_build(self):
+        # Appending the last day shall give the same master_dict as building it from every record
+        self.assertEqual(set(self.master_dict.keys()), set(self.appended_dict.keys()))
+        for area, frame in self.master_dict.items():
+            appended_frame = self.appended_dict[area]
+            self.assertEqual(list(frame.columns), list(appended_frame.columns), 'Failed on ' + area)
+            self.assertTrue((frame.index == appended_frame.index).all(), 'Failed on ' + area)
+            for column in munge.COUNT_COLUMNS:
+                self.assertTrue((frame[column].values == appended_frame[column].values).all(),
+                                'Failed on ' + area + ', ' + column)
+
+    def test_updated_day_is_recounted(self):
+        # Appending the same day twice shall not count its crimes twice
+        areas = munge.get_community_area_names()
+        counts = np.zeros((len(areas), len(self.master_dict['Chicago']), len(munge.COUNT_COLUMNS)))
+        for area_code, area in enumerate(areas):
+            counts[area_code, -1] = self.master_dict[area][munge.COUNT_COLUMNS].values[-1]
+        twice_appended = munge.append_to_master_dict(self.appended_dict, counts)
+
+        for column in munge.COUNT_COLUMNS:
+            self.assertEqual(self.master_dict['Chicago'][column].values[-1],
+                             twice_appended['Chicago'][column].values[-1])
+        # Nothing changed in any area, so every area keeps its data frame
+        for area in areas:
+            self.assertIs(twice_appended[area], self.appended_dict[area])
+
+    def test_time_features(self):
+        frame = self.appended_dict['Edgewater']
+        self.assertEqual(list(frame['Month']), [day.month for day in frame.index])
+        self.assertEqual(list(frame['Weekday']), [day.weekday() for day in frame.index])
+
+
+class TestTranslate(unittest.TestCase):
+    def test_translate(self):
+        translated = munge.translate(pd.Series(['a', 'b', None, 'a']), {'a': 1, 'b': 2}.get, 0, dtype=np.int64)
+        self.assertEqual(translated.tolist(), [1, 2, 0, 1])
+
+    def test_translate_categorical(self):
+        values = pd.Series(['Violent', 'Petty', 'Violent']).astype('category')
+        self.assertEqual(munge.codes_in(values, munge.SEVERITY_LABELS).tolist(), [0, 3, 0])
+
+    def test_invalid_community_areas(self):
+        # Missing, zero and out of range community area numbers shall be dropped
+        data_frame = pd.DataFrame({'Community Area': [1.0, float('nan'), 0.0, 78.0, 77.0]})
+        converted = munge.convert_comm_area_nums_to_names(data_frame)
+        self.assertEqual(list(converted['Community Area']), ['Rogers Park', 'Edgewater'])
+
+
+class TestParseDates(unittest.TestCase):
+    def setUp(self):
+        self.strings = pd.Series(['02/27/2015 11:58:00 PM', '01/01/2001 12:00:00 AM',
+                                  '02/27/2015 11:58:00 PM', None, '02/27/2015 01:05:00 AM'])
+
+    def test_parse_timestamps(self):
+        parsed = munge.parse_timestamps(self.strings)
+        self.assertEqual(parsed[0], pd.Timestamp('2015-02-27 23:58:00'))
+        self.assertEqual(parsed[1], pd.Timestamp('2001-01-01 00:00:00'))
+        self.assertEqual(parsed[4], pd.Timestamp('2015-02-27 01:05:00'))
+        self.assertTrue(pd.isnull(parsed[3]))
+
+    def test_parse_day_numbers(self):
+        days_since_2001 = (date(2015, 2, 27) - date(2001, 1, 1)).days
+        parsed = munge.parse_day_numbers(self.strings)
+        self.assertEqual(parsed.tolist(), [days_since_2001, 0, days_since_2001, -1, days_since_2001])
+
+    def test_days_count_like_timestamps(self):
+        # Counting crimes indexed by day number shall give the same counts as indexing them by timestamp
+        fixture_path = clearn_path('data/fixtures/mediumCrimeSample.csv')
+        timestamps = munge.make_clean_timestamps(pd.read_csv(fixture_path))
+        days = munge.make_clean_days(pd.read_csv(fixture_path))
+        self.assertTrue((munge.count_by_area_and_day(timestamps, timestamps.index.max()) ==
+                         munge.count_by_area_and_day(days, days.index.max())).all())
+
+
+class TestCountByAreaAndDay(unittest.TestCase):
+    def test_known_counts(self):
+        # This fixture has records of two crimes committed on the same day in Humboldt Park
+        fixture_path = clearn_path('data/fixtures/humboldtTwoCrimes.csv')
+        timestamps = munge.make_clean_timestamps(pd.read_csv(fixture_path))
+        counts = munge.count_by_area_and_day(timestamps, timestamps.index.max())
+
+        # There shall be a row for each community area and a column for each day since Jan 1, 2001
+        self.assertEqual(counts.shape, (77, (date(2015, 2, 27) - date(2001, 1, 1)).days + 1, 6))
+
+        humboldt_park = munge.get_community_area_names().index('Humboldt Park')
+        self.assertEqual(counts[humboldt_park, -1].tolist(), [2, 1, 1, 0, 0, 1])
+        # Both crimes were in Humboldt Park on the last day, so nothing else was counted
+        self.assertEqual(counts.sum(), 5)
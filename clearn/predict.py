@@ -1,14 +1,30 @@
 import pandas as pd
 from clearn import munge
+from clearn import hmm
+from clearn import instrument
 from hmmlearn.hmm import MultinomialHMM
 import numpy as np
 from sklearn import linear_model
+from sklearn import preprocessing
+from sklearn.base import clone
 from clearn.convolve import convolve_by_neighbor
-import datetime
+from functools import partial
+import hashlib
 from abc import ABCMeta, abstractmethod
 
 DAYS_IN_MONTH = 30
 
+# Lengths in days of the trailing windows of crime counts NonsequentialPredictor uses as features
+WINDOWS = (7, DAYS_IN_MONTH)
+
+NANOSECONDS_PER_DAY = 24 * 60 * 60 * 10**9
+
+# Seed of the HMM restarts in evaluation and the daily pipeline, so that their votes can be cached between runs
+HMM_RANDOM_STATE = 0
+
+# scikit-learn renamed SGDClassifier's logistic regression loss from 'log' to 'log_loss' (and later dropped 'log')
+LOG_LOSS = 'log_loss' if 'log_loss' in linear_model.SGDClassifier.loss_functions else 'log'
+
 
 class Predictor():
     """
@@ -34,6 +50,25 @@ class Predictor():
         """
         pass
 
+    def predict_many(self, days_to_predict):
+        """
+        Given a list of days (as accepted by predict) or a DatetimeIndex,
+        return a numpy array with a prediction for each day.
+        Predictors override this to share slicing, feature extraction and training across days.
+        """
+        return np.array([self.predict(day) for day in days_to_predict])
+
+    @classmethod
+    def predict_all(cls, time_series_dict, days_to_predict, **options):
+        """
+        Given a dict mapping each community area to a time series ready for this predictor (see preprocess)
+        and a list of days, return a pandas data frame with a row for each day and a column of predictions
+        for each community area. options are passed on to the constructor.
+        """
+        predictions = {area: cls(time_series, **options).predict_many(days_to_predict)
+                       for area, time_series in time_series_dict.items()}
+        return pd.DataFrame(predictions, index=pd.to_datetime(days_to_predict))
+
     @staticmethod
     @abstractmethod
     def preprocess(master_dict):
@@ -46,14 +81,82 @@ class Predictor():
 
 class SequentialPredictor(Predictor):
 
-    def __init__(self, time_series):
+    # Number of hidden states in each HMM
+    N_COMPONENTS = 3
+    # hmmlearn trains for a fixed number of iterations...
+    N_ITER = 10000
+    # while the numpy engine (see hmm.py) trains until the log likelihood improves by less than TOL
+    TOL = 1e-2
+    MAX_ITER = 1000
+
+    def __init__(self, time_series, vote_cache=hmm.SHARED_VOTE_CACHE, random_state=None, engine='numpy',
+                 n_restarts=3, seeds=None, tol=TOL, n_jobs=1):
+        """
+        Votes are memoized in vote_cache (an hmm.VoteCache shared by every predictor by default).
+        Pass vote_cache=None to train the HMMs for every prediction.
+        Votes of unseeded restarts (see seeds below) are random draws, so they are never memoized.
+
+        engine is 'numpy' to train HMMs in batches with hmm.py, or 'hmmlearn' to train them one at a time.
+
+        Each prediction is the majority vote of n_restarts randomly initialized HMMs.
+        seeds gives the seed of each restart. By default the i-th restart gets random_state + i.
+        tol is the numpy engine's convergence tolerance.
+        n_jobs restarts are trained at once in a pool of worker processes (see hmm.majority_vote).
+        """
+        if engine not in ('numpy', 'hmmlearn'):
+            raise ValueError('Unknown HMM engine: ' + str(engine))
+        if seeds is None:
+            seeds = hmm.get_restart_seeds(n_restarts, random_state)
+        elif len(seeds) != n_restarts:
+            raise ValueError('Expected {} seeds, got {}'.format(n_restarts, len(seeds)))
         self.time_series = time_series
+        self.vote_cache = vote_cache
+        self.random_state = random_state
+        self.engine = engine
+        self.seeds = list(seeds)
+        self.tol = tol
+        self.n_jobs = n_jobs
 
     def predict(self, day_to_predict):
         # Get records of 30 days before day_to_predict
         previous_thirty_days = get_previous_month(self.time_series, day_to_predict)
         binary_crime_sequence = previous_thirty_days['Violent Crime Committed?'].values.tolist()
-
+        return self.predict_sequence(binary_crime_sequence)
+
+    def predict_many(self, days_to_predict):
+        # Slice every 30 day window out of one array instead of out of the data frame
+        crime_sequence = self.time_series['Violent Crime Committed?'].values
+        starts, ends = get_window_bounds(self.time_series, days_to_predict, DAYS_IN_MONTH)
+        is_full = ends - starts == DAYS_IN_MONTH
+
+        predictions = np.empty(len(starts), dtype=bool)
+        predictions[is_full] = self.predict_windows(crime_sequence[starts[is_full, np.newaxis] + np.arange(DAYS_IN_MONTH)])
+        # Windows at the very start of the time series are too short to batch. Predict them one at a time.
+        for position in np.nonzero(~is_full)[0]:
+            predictions[position] = self.predict_sequence(crime_sequence[starts[position]:ends[position]].tolist())
+        return predictions
+
+    @classmethod
+    def predict_all(cls, time_series_dict, days_to_predict, **options):
+        areas = sorted(time_series_dict)
+        index = time_series_dict[areas[0]].index
+        starts, ends = get_window_bounds(time_series_dict[areas[0]], days_to_predict, DAYS_IN_MONTH)
+        if any(not time_series_dict[area].index.equals(index) for area in areas) or \
+                (ends - starts != DAYS_IN_MONTH).any():
+            return super(SequentialPredictor, cls).predict_all(time_series_dict, days_to_predict, **options)
+
+        # Gather the windows of every area into one batch
+        crime_matrix = np.vstack([time_series_dict[area]['Violent Crime Committed?'].values for area in areas])
+        windows = crime_matrix[:, starts[:, np.newaxis] + np.arange(DAYS_IN_MONTH)]
+        predictor = cls(time_series_dict[areas[0]], **options)
+        predictions = predictor.predict_windows(windows.reshape(-1, DAYS_IN_MONTH)).reshape(len(areas), len(starts))
+        return pd.DataFrame(predictions.T, index=pd.to_datetime(days_to_predict), columns=areas)
+
+    def predict_sequence(self, binary_crime_sequence):
+        """
+        Given a list of 30 0/1 values for whether a violent crime was committed on each of the last 30 days,
+        return True if we predict a crime the next day, False otherwise.
+        """
         # Unsupervised HMM can't account for string of identical emissions.
         # If we see such a string, just predict the same emission for the following day.
         if binary_crime_sequence == [1]*30:
@@ -61,32 +164,76 @@ class SequentialPredictor(Predictor):
         if binary_crime_sequence == [0]*30:
             return False
 
-        votes = []
-        # Train nine HMMs. They are initialized randomly, so we take "votes" from nine HMMs.
-        #  Why 9? Odd numbers preclude ties.
-        #  And nine is a decent tradeoff between performance and getting bad results by chance
-        for _ in range(3):
-            # Train HMM
-            model = MultinomialHMM(n_components=3, n_iter=10000)
-            model.fit([np.array(binary_crime_sequence)])
+        return bool(self.vote_windows(np.array([binary_crime_sequence]))[0])
 
-            # Determine the most likely state of the last day in the sequence
-            last_state_probs = model.predict_proba(binary_crime_sequence)[-1]
-            current_state = self.get_most_likely(last_state_probs)
-
-            # Determine the most likely state of the day we're trying to predict
-            transition_probs = model.transmat_[current_state]
-            next_state = self.get_most_likely(transition_probs)
+    def predict_windows(self, windows):
+        """
+        Given a (window x 30) array of 0/1 values, returns an array with predict_sequence's prediction for each window
+        """
+        windows = np.asarray(windows, dtype=np.int64)
+        # Like predict_sequence, predict the same emission for windows that are all the same
+        predictions = windows.all(axis=1)
+        needs_hmm = windows.any(axis=1) & ~predictions
+
+        # Many windows repeat, so train HMMs once for each distinct window
+        hmm_windows = windows[needs_hmm]
+        packed = hmm_windows.dot(1 << np.arange(windows.shape[1] - 1, -1, -1))
+        _, first_positions, inverse = np.unique(packed, return_index=True, return_inverse=True)
+        predictions[needs_hmm] = self.vote_windows(hmm_windows[first_positions])[inverse.ravel()]
+        return predictions
+
+    def vote_windows(self, windows):
+        """
+        Returns an array with a vote for each window in windows, answering from vote_cache where possible
+        """
+        if self.vote_cache is None or None in self.seeds:
+            return self.vote_batch(windows)
+
+        settings = (self.engine, self.N_COMPONENTS, self.N_ITER if self.engine == 'hmmlearn' else self.tol,
+                    self.seeds)
+        keys = [self.vote_cache.make_key(window.tolist(), settings) for window in windows]
+        votes = [self.vote_cache.get(key) for key in keys]
+
+        uncached = [position for position, vote in enumerate(votes) if vote is None]
+        if uncached:
+            for position, vote in zip(uncached, self.vote_batch(windows[uncached])):
+                votes[position] = bool(vote)
+                self.vote_cache.put(keys[position], votes[position])
+        return np.array(votes, dtype=bool)
+
+    @instrument.timed('SequentialPredictor.vote_batch')
+    def vote_batch(self, windows):
+        """
+        Trains HMMs on each window in windows and returns an array that is True
+        where the majority of a window's HMMs predict a crime the next day.
+        """
+        # HMMs are initialized randomly, so we take "votes" from several of them.
+        #  An odd number of restarts precludes ties.
+        return hmm.majority_vote(self.make_restart_trainer(windows), self.seeds, len(windows), self.n_jobs)
 
-            # Determine the most likely emission (crime/no crime) from a day in that state
-            emissions = model.emissionprob_[next_state]
-            vote = self.get_most_likely(emissions)
+    def vote(self, binary_crime_sequence):
+        """
+        Returns True if the majority of the HMMs trained on binary_crime_sequence predict a crime the next day.
+        """
+        return bool(self.vote_batch(np.array([binary_crime_sequence]))[0])
 
-            # Record this HMM's vote
-            votes.append(vote)
+    def make_restart_trainer(self, windows):
+        """
+        :return: picklable function of (seed, positions) training one HMM per window at positions
+            for hmm.majority_vote and returning their votes
+        """
+        if self.engine == 'numpy':
+            # Each HMM is trained on every window at once
+            return partial(hmm.vote_restart, windows, n_components=self.N_COMPONENTS, tol=self.tol,
+                           n_iter=self.MAX_ITER)
+        return partial(vote_restart_with_hmmlearn, windows, n_components=self.N_COMPONENTS, n_iter=self.N_ITER)
 
-        # Votes are 1 for crime, 0 for no crime. Return True if majority votes for crime.
-        return sum(votes) > 1
+    def vote_with_hmmlearn(self, binary_crime_sequence, seed):
+        """
+        Trains one HMM on binary_crime_sequence with hmmlearn
+        and returns 1 if it predicts a crime the next day, 0 otherwise.
+        """
+        return vote_with_hmmlearn(binary_crime_sequence, seed, self.N_COMPONENTS, self.N_ITER)
 
     @staticmethod
     def get_most_likely(probs):
@@ -101,8 +248,9 @@ class SequentialPredictor(Predictor):
         boolean_dict = BaselinePredictor.preprocess(master_dict)
 
         def convert_bool_frame_to_binary(df):
-            df['Violent Crime Committed?'] = [int(boolean) for boolean in df['Violent Crime Committed?']]
-            return df
+            # Build a new frame rather than overwriting the column, so master_dict is left as it was
+            binary_column = df['Violent Crime Committed?'].values.astype(np.int64)
+            return pd.DataFrame({'Violent Crime Committed?': binary_column}, index=df.index)
 
         sequential_dict = {area: convert_bool_frame_to_binary(frame) for area, frame in boolean_dict.items()}
         return sequential_dict
@@ -110,11 +258,43 @@ class SequentialPredictor(Predictor):
 
 class NonsequentialPredictor(Predictor):
 
-    def __init__(self, time_series, model=linear_model.LogisticRegression()):
+    def __init__(self, time_series, model=None, incremental=False, retrain_interval=1, model_store=None,
+                 model_key=None):
+        """
+        If incremental is True, predictions must be requested in order of increasing day for best performance.
+        Instead of refitting on the whole history for every prediction,
+        the model is updated with partial_fit on just the days since the last prediction.
+        Features are standardized by a scaler updated the same way, since stochastic gradient descent
+        diverges on raw counts in the hundreds.
+
+        predict_many only retrains the model every retrain_interval days.
+
+        If model_store (a models.ModelStore) and model_key (the community area's name) are given,
+        predict_many starts from the fit stored for the area when it was trained on the same features and days
+        (or, in incremental mode, on the days before them) and stores its last fit for next time.
+        """
         self.time_series = time_series
+        self.incremental = incremental
+        self.retrain_interval = retrain_interval
+        if model is None:
+            # Averaging the weights over every update keeps one day's update from swinging the model
+            model = linear_model.SGDClassifier(loss=LOG_LOSS, average=True) if incremental \
+                else linear_model.LogisticRegression()
         self.model = model
+        self.scaler = preprocessing.StandardScaler() if incremental else None
+        self.model_store = model_store if model_key is not None else None
+        self.model_key = model_key
+
+        # Used in incremental mode
+        self.features = None
+        self.targets = None
+        self.num_days_trained = 0
+        # Whether the model has been fit since it was last loaded from or saved to model_store
+        self.fit_changed = False
 
     def predict(self, day_to_predict):
+        if self.incremental:
+            return self.predict_incrementally(day_to_predict)
 
         training_frame = self.get_time_series_including(self.time_series, day_to_predict)
 
@@ -138,40 +318,213 @@ class NonsequentialPredictor(Predictor):
         prediction = self.model.predict(feature_vec_to_classify)[0]
         return prediction
 
+    def predict_incrementally(self, day_to_predict):
+        features, _ = self.get_training_arrays()
+        last_day = get_last_positions(self.time_series, [day_to_predict])[0]
+        self.train_incrementally(last_day)
+        return self.model.predict(self.scaler.transform(features[last_day:last_day + 1]))[0]
+
+    def predict_many(self, days_to_predict):
+        features, targets = self.get_training_arrays()
+        last_days = get_last_positions(self.time_series, days_to_predict)
+
+        # Walk forward through the days, retraining every retrain_interval days.
+        #   Each group of days is predicted by the model trained on the group's first day.
+        groups = []
+        for index in np.argsort(last_days, kind='mergesort'):
+            last_day = last_days[index]
+            if not groups or last_day - groups[-1][0] >= self.retrain_interval:
+                groups.append((last_day, []))
+            groups[-1][1].append(index)
+
+        predictions = [None] * len(last_days)
+        for trained_day, indices in groups:
+            group_features = features[last_days[indices]]
+            if self.incremental:
+                self.train_incrementally(trained_day)
+                group_features = self.scaler.transform(group_features)
+            elif not self.load_fit(trained_day):
+                # Same alignment as predict(): each day's features with the NEXT day's target
+                with instrument.stage('NonsequentialPredictor.fit'):
+                    self.model.fit(features[:trained_day], targets[1:trained_day + 1])
+                self.num_days_trained = trained_day
+                self.fit_changed = True
+            group_predictions = self.model.predict(group_features)
+            for index, prediction in zip(indices, group_predictions):
+                predictions[index] = prediction
+
+        if self.fit_changed and self.model_store is not None:
+            self.save_fit()
+        return np.array(predictions)
+
+    @classmethod
+    def predict_all(cls, time_series_dict, days_to_predict, **options):
+        if options.get('model_store') is None:
+            return super(NonsequentialPredictor, cls).predict_all(time_series_dict, days_to_predict, **options)
+        # Each area's fit is stored under the area's name
+        predictions = {area: cls(time_series, model_key=area, **options).predict_many(days_to_predict)
+                       for area, time_series in time_series_dict.items()}
+        return pd.DataFrame(predictions, index=pd.to_datetime(days_to_predict))
+
+    def get_training_arrays(self):
+        if self.features is None:
+            # Split the time series into features and targets once, instead of for every prediction
+            self.targets = self.time_series['Violent Crime Committed?'].values
+            self.features = self.time_series.drop('Violent Crime Committed?', axis=1).values
+        return self.features, self.targets
+
+    def train_incrementally(self, last_day):
+        """
+        Updates the model to be ready to predict the day at position last_day in the time series.
+
+        Like predict(), each day's features are aligned with whether a violent crime was committed the NEXT day,
+        but only pairs whose target comes before last_day are trained on.
+        The target of last_day is the outcome being predicted, so the model never sees it.
+        """
+        features, targets = self.get_training_arrays()
+
+        if last_day < self.num_days_trained:
+            # We've already trained on days after this one. Start over from scratch.
+            self.model = clone(self.model)
+            self.scaler = clone(self.scaler)
+            self.num_days_trained = 0
+
+        if self.num_days_trained == 0:
+            # Pick up from a stored fit on the days before this one, if there is one
+            self.load_fit(last_day)
+
+        if last_day > self.num_days_trained:
+            # Only the days we haven't trained on yet. The first pair has no earlier day to take features from.
+            first_feature = max(self.num_days_trained - 1, 0)
+            new_features = features[first_feature:last_day - 1]
+            new_targets = targets[first_feature + 1:last_day]
+            if len(new_features):
+                with instrument.stage('NonsequentialPredictor.partial_fit'):
+                    self.scaler.partial_fit(new_features)
+                    self.model.partial_fit(self.scaler.transform(new_features), new_targets,
+                                           classes=np.array([False, True]))
+            self.num_days_trained = last_day
+            self.fit_changed = True
+
+    def load_fit(self, last_day):
+        """
+        Replaces the model with the one in model_store if it was fitted with the same schema on the same days
+            up to position last_day (or, in incremental mode, up to any position before it).
+
+        :return: True if the model was replaced
+        """
+        if self.model_store is None:
+            return False
+        with instrument.stage('NonsequentialPredictor.load_fit'):
+            entry = self.model_store.get(self.get_store_name(), self.model_key, self.get_schema())
+            if entry is None:
+                return False
+            num_days = entry['num_days_trained']
+            usable = num_days <= last_day if self.incremental else num_days == last_day
+            # The fingerprint changes if any of the days the model was trained on have since been revised
+            if not usable or entry['fingerprint'] != self.get_fingerprint(num_days):
+                return False
+            self.model = entry['model']
+            self.scaler = entry.get('scaler')
+            self.num_days_trained = num_days
+            self.fit_changed = False
+            return True
+
+    def save_fit(self):
+        with instrument.stage('NonsequentialPredictor.save_fit'):
+            self.model_store.put(self.get_store_name(), self.model_key, self.get_schema(), model=self.model,
+                                 scaler=self.scaler, num_days_trained=self.num_days_trained,
+                                 fingerprint=self.get_fingerprint(self.num_days_trained))
+        self.fit_changed = False
+
+    def get_store_name(self):
+        return type(self).__name__ + ('.incremental' if self.incremental else '')
+
+    def get_schema(self):
+        """
+        :return: tuple of the feature columns and the model's settings. Stored fits with another schema are dropped.
+        """
+        columns = tuple(column for column in self.time_series.columns if column != 'Violent Crime Committed?')
+        settings = sorted(self.model.get_params().items())
+        return columns, type(self.model).__name__, repr(settings)
+
+    def get_fingerprint(self, num_days):
+        """
+        :return: hash of the features and targets the model is trained on when trained up to position num_days
+        """
+        features, targets = self.get_training_arrays()
+        fingerprint = hashlib.sha1()
+        fingerprint.update(np.ascontiguousarray(features[:num_days]).tobytes())
+        fingerprint.update(np.ascontiguousarray(targets[1:num_days + 1]).tobytes())
+        return fingerprint.hexdigest()
+
     @staticmethod
-    def preprocess(master_dict, convolve=False):
+    def preprocess(master_dict, convolve=False, windows=WINDOWS):
+        """
+        windows are the lengths in days of the trailing windows to count crimes in (see extract_windows).
+
+        convolve adds sums of violent crime over the areas around each area (see convolve.py).
+        It's True for direct neighbors, a dict of keyword arguments for convolve_by_neighbor (like hops or bandwidth),
+        or a list of such dicts to add several sets of spatial features.
+        """
 
         # Add windows of recent crime history to every data frame
-        with_windows = {area: NonsequentialPredictor.extract_windows(frame) for area, frame in master_dict.items()}
+        with_windows = NonsequentialPredictor.extract_windows_by_area(master_dict, windows)
 
         # Take data for the entire city out of master_dict
-        chicago_frame = with_windows.pop('Chicago')
-        # and relabel its columns to make clear that it is city data.
-        new_column_names = ['Chicago ' + old_name for old_name in list(chicago_frame)]
-        chicago_frame.columns = new_column_names
+        #  and relabel its columns to make clear that it is city data.
+        chicago_frame = with_windows.pop('Chicago').add_prefix('Chicago ')
 
         # Map each community area to a dataframe containing that area's recent history
         #   AND the whole city's recent history
         with_city_history = {area: frame.join(chicago_frame) for area, frame in with_windows.items()}
 
-        if convolve:
-            return convolve_by_neighbor(with_city_history)
-        else:
-            return with_city_history
+        if convolve is True:
+            convolve = [{}]
+        elif isinstance(convolve, dict):
+            convolve = [convolve]
+        for convolve_options in (convolve or []):
+            with_city_history = convolve_by_neighbor(with_city_history, **convolve_options)
+        return with_city_history
 
     @staticmethod
-    def extract_windows(days):
-        # Add categories to count types of crimes committed in time windows leading to date we're trying to predict
-        for label in ['Violent', 'Severe', 'Minor', 'Petty']:
-            days[label + ' Crimes in Last Week'] = pd.rolling_sum(days[label + ' Crimes'], 7)
-            days[label + ' Crimes in Last Month'] = pd.rolling_sum(days[label + ' Crimes'], 30)
-        # The earliest 30 days in the time series have missing values for their first 30 days. Remove those days.
-        return days[30:]
+    def extract_windows(days, windows=WINDOWS):
+        """
+        Returns a new data frame with the columns of days plus counts of each type of crime committed
+            in trailing windows of each length in windows (including each day itself). days itself is not modified.
+        The earliest days don't have enough history for the longest window, so they are left out.
+        """
+        counts = days[get_count_columns()].values.astype(np.float64)
+        window_frame = make_window_frame(get_trailing_sums(counts, windows, axis=0), windows, days.index)
+        return days.join(window_frame)[max(windows):]
+
+    @staticmethod
+    @instrument.timed('NonsequentialPredictor.extract_windows_by_area')
+    def extract_windows_by_area(days_by_area, windows=WINDOWS):
+        """
+        extract_windows for every data frame in days_by_area.
+        When they all share the same days, the windows of every area come from one cumulative sum.
+        """
+        areas = sorted(days_by_area)
+        index = days_by_area[areas[0]].index
+        if any(not days_by_area[area].index.equals(index) for area in areas):
+            return {area: NonsequentialPredictor.extract_windows(frame, windows)
+                    for area, frame in days_by_area.items()}
+
+        # (area x day x crime type) tensor of counts
+        counts = np.array([days_by_area[area][get_count_columns()].values for area in areas], dtype=np.float64)
+        trailing_sums = get_trailing_sums(counts, windows, axis=1)
+
+        with_windows = {}
+        for position, area in enumerate(areas):
+            window_frame = make_window_frame([sums[position] for sums in trailing_sums], windows, index)
+            with_windows[area] = days_by_area[area].join(window_frame)[max(windows):]
+        return with_windows
 
     @staticmethod
     def get_time_series_including(time_series, day):
-        # Grab data frame with all days including the last day, and then cut off the last day
-        return time_series.loc[:day]
+        # Grab data frame with all days including the last day (a positional slice, so nothing is copied)
+        return time_series.iloc[:get_last_positions(time_series, [day])[0] + 1]
 
 
 class BaselinePredictor(Predictor):
@@ -188,14 +541,123 @@ class BaselinePredictor(Predictor):
         prediction = proportion_of_days_with_violent_crime > .5
         return prediction
 
+    def predict_many(self, days_to_predict):
+        crime_matrix = self.time_series['Violent Crime Committed?'].values[np.newaxis, :]
+        starts, ends = get_window_bounds(self.time_series, days_to_predict, DAYS_IN_MONTH)
+        return self.predict_from_window_bounds(crime_matrix, starts, ends)[0]
+
+    @classmethod
+    def predict_all(cls, time_series_dict, days_to_predict, **options):
+        areas = sorted(time_series_dict)
+        index = time_series_dict[areas[0]].index
+        if any(not time_series_dict[area].index.equals(index) for area in areas):
+            # No common index to line the areas up on
+            return super(BaselinePredictor, cls).predict_all(time_series_dict, days_to_predict, **options)
+
+        # Stack every area's time series into one (area x day) matrix and predict all of it at once
+        crime_matrix = np.vstack([time_series_dict[area]['Violent Crime Committed?'].values for area in areas])
+        starts, ends = get_window_bounds(time_series_dict[areas[0]], days_to_predict, DAYS_IN_MONTH)
+        predictions = cls.predict_from_window_bounds(crime_matrix, starts, ends)
+        return pd.DataFrame(predictions.T, index=pd.to_datetime(days_to_predict), columns=areas)
+
+    @staticmethod
+    def predict_from_window_bounds(crime_matrix, starts, ends):
+        """
+        Given an (area x day) matrix of whether a violent crime was committed
+        and window bounds as returned by get_window_bounds,
+        returns an (area x window) matrix of predictions
+        """
+        # Count the days with violent crime in every window at once from a cumulative sum
+        days_with_violent_crime = np.zeros((crime_matrix.shape[0], crime_matrix.shape[1] + 1))
+        np.cumsum(crime_matrix, axis=1, out=days_with_violent_crime[:, 1:])
+        num_days_with_violent_crime = days_with_violent_crime[:, ends] - days_with_violent_crime[:, starts]
+        return num_days_with_violent_crime / DAYS_IN_MONTH > .5
+
     @staticmethod
     def preprocess(master_area_dict):
-        del master_area_dict['Chicago']
+        # Leave out city-wide data without deleting it from master_area_dict
         days_by_area = {area: munge.drop_all_columns_but(frame, ['Violent Crime Committed?'])
-                        for area, frame in master_area_dict.items()}
+                        for area, frame in master_area_dict.items() if area != 'Chicago'}
         return days_by_area
 
 
+def vote_restart_with_hmmlearn(windows, seed, positions, n_components, n_iter):
+    """
+    One restart for hmm.majority_vote with hmmlearn: the vote of an HMM seeded with seed on each window at positions
+    """
+    return [vote_with_hmmlearn(windows[position].tolist(), seed, n_components, n_iter) for position in positions]
+
+
+def vote_with_hmmlearn(binary_crime_sequence, seed, n_components, n_iter):
+    """
+    Trains one HMM on binary_crime_sequence with hmmlearn
+    and returns 1 if it predicts a crime the next day, 0 otherwise.
+    """
+    # Train HMM
+    model = MultinomialHMM(n_components=n_components, n_iter=n_iter, random_state=seed)
+    model.fit([np.array(binary_crime_sequence)])
+
+    # Determine the most likely state of the last day in the sequence
+    last_state_probs = model.predict_proba(binary_crime_sequence)[-1]
+    current_state = SequentialPredictor.get_most_likely(last_state_probs)
+
+    # Determine the most likely state of the day we're trying to predict
+    transition_probs = model.transmat_[current_state]
+    next_state = SequentialPredictor.get_most_likely(transition_probs)
+
+    # Determine the most likely emission (crime/no crime) from a day in that state
+    emissions = model.emissionprob_[next_state]
+    return SequentialPredictor.get_most_likely(emissions)
+
+
+def get_count_columns():
+    return [label + ' Crimes' for label in munge.SEVERITY_LABELS]
+
+
+def get_window_column_name(count_column, window):
+    """
+    'Violent Crimes' with a 7 day window becomes 'Violent Crimes in Last Week',
+        with a 30 day window 'Violent Crimes in Last Month', and with any other n day window 'Violent Crimes in Last n Days'
+    """
+    if window == 7:
+        return count_column + ' in Last Week'
+    if window == DAYS_IN_MONTH:
+        return count_column + ' in Last Month'
+    return count_column + ' in Last {} Days'.format(window)
+
+
+def get_trailing_sums(counts, windows, axis=0):
+    """
+    Given an array of counts with days along axis,
+    returns a list with an array of the same shape for each length in windows,
+    holding the sum of counts over that many days up to and including each day
+    (NaN where there isn't enough history yet).
+    """
+    counts = np.rollaxis(counts, axis)
+    # cumulative[t] is the sum of the first t days, so any window's sum is a difference of two entries
+    cumulative = np.zeros((counts.shape[0] + 1,) + counts.shape[1:])
+    np.cumsum(counts, axis=0, out=cumulative[1:])
+
+    trailing_sums = []
+    for window in windows:
+        sums = np.full(counts.shape, np.nan)
+        sums[window - 1:] = cumulative[window:] - cumulative[:len(cumulative) - window]
+        trailing_sums.append(np.rollaxis(sums, 0, axis + 1))
+    return trailing_sums
+
+
+def make_window_frame(trailing_sums, windows, index):
+    """
+    Given get_trailing_sums' arrays for one area (day x crime type),
+    returns data frame with a column for each crime type and window
+    """
+    window_frame = pd.DataFrame(index=index)
+    for column_number, count_column in enumerate(get_count_columns()):
+        for sums, window in zip(trailing_sums, windows):
+            window_frame[get_window_column_name(count_column, window)] = sums[:, column_number]
+    return window_frame
+
+
 """
 Helper function used for baseline and sequential
 """
@@ -205,7 +667,78 @@ def get_previous_month(time_series, day):
         """
         Given pandas dataframe indexed by day,
         returns pandas dataframe consisting of the 30 days before day
+        (a positional slice that shares its data with time_series)
         """
-        thirty_days_ago = day - datetime.timedelta(days=DAYS_IN_MONTH)
-        yesterday = day - datetime.timedelta(days=1)
-        return time_series.loc[thirty_days_ago: yesterday]
\ No newline at end of file
+        starts, ends = get_window_bounds(time_series, [day], DAYS_IN_MONTH)
+        return time_series.iloc[starts[0]:ends[0]]
+
+
+def get_window_bounds(time_series, days, length):
+    """
+    Given pandas dataframe indexed by day and a list of days,
+    returns a pair of numpy arrays (starts, ends) such that time_series[starts[i]:ends[i]]
+    consists of the length days before days[i]
+    """
+    stamps = get_stamps(days)
+    ends = get_day_positions(time_series.index, stamps)
+    starts = get_day_positions(time_series.index, stamps, offset=-length)
+    return starts, ends
+
+
+def get_last_positions(time_series, days):
+    """
+    Given pandas dataframe indexed by day and a list of days,
+    returns numpy array with the position of the last row on or before each day
+    """
+    return get_day_positions(time_series.index, days, side='right') - 1
+
+
+def get_day_positions(index, days, offset=0, side='left'):
+    """
+    Given a DatetimeIndex of days and a list of days (or an array from get_stamps),
+    returns numpy array with where each day (shifted by offset days) falls in index,
+    like index.searchsorted(days, side).
+
+    Every time series built from the master dict has one row per day with no gaps,
+    so positions are just days since the first day. Other indexes are searched.
+    """
+    stamps = get_stamps(days)
+    if offset:
+        stamps = stamps + offset * NANOSECONDS_PER_DAY
+    if len(index) == 0:
+        return np.zeros(len(stamps), dtype=np.int64)
+
+    if is_contiguous(index) and not (stamps % NANOSECONDS_PER_DAY).any():
+        positions = (stamps - index[0].value) // NANOSECONDS_PER_DAY
+        if side == 'right':
+            positions += 1
+        return np.clip(positions, 0, len(index)).astype(np.int64)
+    return np.asarray(index.searchsorted(pd.DatetimeIndex(stamps.view('datetime64[ns]')), side=side),
+                      dtype=np.int64)
+
+
+def get_stamps(days):
+    """
+    :return: numpy array of each of days as nanoseconds since the epoch (integer arrays are passed through)
+    """
+    if isinstance(days, np.ndarray) and days.dtype == np.int64:
+        return days
+    if isinstance(days, pd.DatetimeIndex):
+        return np.asarray(days.values, dtype='datetime64[ns]').view(np.int64)
+    return np.array([pd.Timestamp(day).value for day in days], dtype=np.int64)
+
+
+def is_contiguous(index):
+    """
+    :return: True if index is sorted and has exactly one entry for every day from its first day to its last
+    """
+    if len(index) == 0:
+        return True
+    if index[0].value % NANOSECONDS_PER_DAY:
+        # Doesn't start at midnight
+        return False
+    if index.freq is not None:
+        # Ranges of days (like every time series in the master dict, and slices of them) know their frequency
+        return index.freqstr == 'D'
+    # Strictly increasing, one day apart
+    return (np.diff(get_stamps(index)) == NANOSECONDS_PER_DAY).all()
@@ -1,9 +1,20 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from functools import partial
 from sklearn.base import BaseEstimator
 import pandas as pd
 import datetime
 from clearn.predict import SequentialPredictor, BaselinePredictor, NonsequentialPredictor
+from clearn import predict
+from clearn.hmm import VoteCache
+from clearn import hmm
+from clearn import munge
+from clearn import synthetic
+import numpy as np
+import os
+import shutil
+import tempfile
+import time
 
 
 class SequentialTests(unittest.TestCase):
@@ -37,6 +48,168 @@ class SequentialTests(unittest.TestCase):
         self.assertTrue(predictor.predict(self.date_to_predict))
 
 
+    def test_vote_cache(self):
+        self.time_series['Violent Crime Committed?'] = [0, 0, 1] + [0]*29
+        cache = VoteCache()
+        predictor = SequentialPredictor(self.time_series, vote_cache=cache, random_state=0)
+        predictor.vote_batch = MagicMock(return_value=np.array([False]))
+
+        # The first prediction trains HMMs. The second, on the same sequence, shall reuse their vote.
+        self.assertFalse(predictor.predict(self.date_to_predict))
+        self.assertFalse(predictor.predict(self.date_to_predict))
+        self.assertEqual(predictor.vote_batch.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # Sequences that are all the same don't need HMMs, so they never touch the cache
+        self.time_series['Violent Crime Committed?'] = [0]*32
+        predictor.predict(self.date_to_predict)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+    def test_unseeded_votes_not_cached(self):
+        # Unseeded HMMs vote differently on every run, so their votes shall not be reused
+        self.time_series['Violent Crime Committed?'] = [0, 0, 1] + [0]*29
+        cache = VoteCache()
+        predictor = SequentialPredictor(self.time_series, vote_cache=cache)
+        predictor.vote_batch = MagicMock(return_value=np.array([False]))
+        predictor.predict(self.date_to_predict)
+        predictor.predict(self.date_to_predict)
+        self.assertEqual(predictor.vote_batch.call_count, 2)
+        self.assertEqual(len(cache.votes), 0)
+
+
+    def test_predict_many(self):
+        # Batched predictions shall match one-at-a-time predictions, and repeated windows shall be trained once
+        self.time_series['Violent Crime Committed?'] = [0, 1, 1, 0, 0, 1, 0, 0]*4
+        predictor = SequentialPredictor(self.time_series, vote_cache=None, random_state=0)
+        days = list(self.time_series.index[-2:]) + [self.time_series.index[-1] + datetime.timedelta(days=1)]
+        self.assertEqual(predictor.predict_many(days).tolist(), [predictor.predict(day) for day in days])
+
+    def test_predict_all(self):
+        self.time_series['Violent Crime Committed?'] = [0, 1, 1, 0, 0, 1, 0, 0]*4
+        other_time_series = self.time_series.copy()
+        other_time_series['Violent Crime Committed?'] = [1, 1, 1, 0]*8
+        time_series_dict = {'Edgewater': self.time_series, 'Uptown': other_time_series}
+
+        days = list(self.time_series.index[-2:])
+        predictions = SequentialPredictor.predict_all(time_series_dict, days, vote_cache=None, random_state=0)
+        for area, time_series in time_series_dict.items():
+            predictor = SequentialPredictor(time_series, vote_cache=None, random_state=0)
+            self.assertEqual(predictions[area].tolist(), [predictor.predict(day) for day in days])
+
+
+class BatchHMMTests(unittest.TestCase):
+    def test_batch_matches_single(self):
+        # With a seed, an HMM's vote shall not depend on what else is in its batch
+        sequences = np.array([[0, 0, 1] + [0]*27, [1, 1, 0] + [1]*27, [0, 1]*15])
+        batch_votes = hmm.vote(sequences, random_state=0)
+        single_votes = [hmm.vote(sequences[position:position + 1], random_state=0)[0] for position in range(3)]
+        self.assertEqual(batch_votes.tolist(), single_votes)
+
+    def test_fit_probabilities(self):
+        startprob, transmat, emissionprob, posteriors = hmm.fit(np.array([[0, 1]*15]), random_state=0)
+        # Every distribution shall sum to one
+        for probs in [startprob, transmat, emissionprob, posteriors]:
+            self.assertTrue(np.allclose(probs.sum(axis=-1), 1))
+
+
+class MajorityVoteTests(unittest.TestCase):
+    def test_early_stop(self):
+        # Once the first two restarts agree, the third shall not be trained
+        train_restart = MagicMock(return_value=np.array([1]))
+        votes = hmm.majority_vote(train_restart, [0, 1, 2], 1)
+        self.assertEqual(votes.tolist(), [True])
+        self.assertEqual(train_restart.call_count, 2)
+
+    def test_undecided_positions(self):
+        # Only sequences without a majority shall be trained again
+        trained_positions = []
+
+        def train_restart(seed, positions):
+            trained_positions.append(positions.tolist())
+            return np.array([seed % 2 if position == 0 else 0 for position in positions])
+
+        votes = hmm.majority_vote(train_restart, [0, 1, 3], 2)
+        self.assertEqual(votes.tolist(), [True, False])
+        self.assertEqual(trained_positions, [[0, 1], [0, 1], [0]])
+
+    def test_parallel_matches_serial(self):
+        sequences = np.array([[0, 0, 1] + [0]*27, [1, 1, 0] + [1]*27, [0, 1]*15])
+        train_restart = partial(hmm.vote_restart, sequences)
+        seeds = hmm.get_restart_seeds(5, random_state=7)
+        self.assertEqual(hmm.majority_vote(train_restart, seeds, 3).tolist(),
+                         hmm.majority_vote(train_restart, seeds, 3, n_jobs=3).tolist())
+
+    def test_early_stop_in_parallel(self):
+        # With as many jobs as restarts, the first wave shall only train as many restarts as make a majority
+        class InlinePool():
+            def __init__(self, processes):
+                pass
+
+            def starmap(self, function, arguments):
+                return [function(*argument) for argument in arguments]
+
+            def terminate(self):
+                pass
+
+        train_restart = MagicMock(return_value=np.array([1]))
+        with patch('clearn.hmm.multiprocessing.Pool', InlinePool):
+            votes = hmm.majority_vote(train_restart, [0, 1, 2], 1, n_jobs=3)
+        self.assertEqual(votes.tolist(), [True])
+        self.assertEqual(train_restart.call_count, 2)
+
+    @unittest.skipUnless((os.cpu_count() or 1) > 1, 'needs more than one CPU')
+    def test_parallel_speedup(self):
+        windows = np.random.RandomState(0).randint(0, 2, (3000, 30))
+        train_restart = partial(hmm.vote_restart, windows)
+        seeds = hmm.get_restart_seeds(3, random_state=0)
+        started = time.perf_counter()
+        hmm.majority_vote(train_restart, seeds, len(windows))
+        serial_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        hmm.majority_vote(train_restart, seeds, len(windows), n_jobs=3)
+        parallel_seconds = time.perf_counter() - started
+        self.assertLess(parallel_seconds, serial_seconds)
+
+    def test_restart_seeds(self):
+        self.assertEqual(hmm.get_restart_seeds(3, 10), [10, 11, 12])
+        self.assertEqual(hmm.get_restart_seeds(2), [None, None])
+
+
+class VoteCacheTests(unittest.TestCase):
+    def test_keys(self):
+        # Keys shall tell apart sequences that only differ in leading zeros, and differing settings
+        keys = {VoteCache.make_key([0, 1], (3,)), VoteCache.make_key([1], (3,)),
+                VoteCache.make_key([0, 1], (4,)), VoteCache.make_key([0, 1], (3,))}
+        self.assertEqual(len(keys), 3)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VoteCache(max_size=2)
+        cache.put('a', True)
+        cache.put('b', False)
+        cache.get('a')
+        cache.put('c', True)
+        self.assertIsNone(cache.get('b'))
+        self.assertTrue(cache.get('a'))
+        self.assertTrue(cache.get('c'))
+
+    def test_persistent_tier(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'votes')
+            cache = VoteCache(path=path)
+            cache.put('a', True)
+            cache.close()
+
+            # A new cache at the same path shall find the vote on disk
+            reopened = VoteCache(path=path)
+            self.assertTrue(reopened.get('a'))
+            self.assertEqual(reopened.disk_hits, 1)
+            reopened.close()
+        finally:
+            shutil.rmtree(directory)
+
+
 class BaselineTests(unittest.TestCase):
     def setUp(self):
         # Create index of 30 dates from arbitrary start point
@@ -64,6 +237,27 @@ class BaselineTests(unittest.TestCase):
         self.assertFalse(predictor.predict(self.date_to_predict))
 
 
+    def test_predict_many(self):
+        # predict_many shall agree with predict on every day, including one past the time series
+        self.time_series['Violent Crime Committed?'] = [True]*16 + [False]*14
+        predictor = BaselinePredictor(self.time_series)
+        days = list(pd.date_range('1/10/2011', periods=22, freq='D'))
+        self.assertEqual(predictor.predict_many(days).tolist(), [predictor.predict(day) for day in days])
+
+    def test_predict_all(self):
+        # predict_all shall make the same predictions for every area as each area's own predictor
+        majority_crime = self.time_series.copy()
+        majority_crime['Violent Crime Committed?'] = [True]*16 + [False]*14
+        minority_crime = self.time_series.copy()
+        minority_crime['Violent Crime Committed?'] = [False]*14 + [True]*16
+        time_series_dict = {'Edgewater': majority_crime, 'Uptown': minority_crime}
+
+        days = list(pd.date_range('1/20/2011', periods=12, freq='D'))
+        predictions = BaselinePredictor.predict_all(time_series_dict, days)
+        for area, time_series in time_series_dict.items():
+            self.assertEqual(predictions[area].tolist(), BaselinePredictor(time_series).predict_many(days).tolist())
+
+
 class NonsequentialTests(unittest.TestCase):
     def test_vector_alignment(self):
         # Mock out a generic scikit-learn classifier
@@ -122,6 +316,132 @@ class NonsequentialTests(unittest.TestCase):
         self.assertEqual(observed_day_to_predict.tolist(), [[1]])
 
 
+    def test_incremental_training(self):
+        # Mock out a scikit-learn classifier that can be trained incrementally
+        mocked_model = BaseEstimator()
+        mocked_model.partial_fit = MagicMock()
+        mocked_model.predict = MagicMock(return_value=[True])
+
+        date_sequence = pd.date_range('1/1/2011', periods=15, freq='D')
+        time_series = pd.DataFrame({
+            'Violent Crime Committed?': [True, True] + [False]*13,
+            'Other Data': list(range(15))
+        }, index=date_sequence)
+        predictor = NonsequentialPredictor(time_series, model=mocked_model, incremental=True)
+
+        # The first prediction trains on every day before the day to predict, aligned like in test_vector_alignment,
+        #   but never on whether a crime was committed on the day to predict itself
+        self.assertTrue(predictor.predict(datetime.date(2011, 1, 13)))
+        fit_args = mocked_model.partial_fit.call_args[0]
+        # Features reach the model standardized
+        self.assertAlmostEqual(fit_args[0].mean(), 0)
+        self.assertEqual(predictor.scaler.inverse_transform(fit_args[0]).round().tolist(), [[num] for num in range(11)])
+        self.assertEqual(fit_args[1].tolist(), [True] + [False]*10)
+        self.assertEqual(predictor.scaler.inverse_transform(mocked_model.predict.call_args[0][0]).round().tolist(),
+                         [[12]])
+
+        # The next prediction shall only train on the one day that is new since the last prediction
+        predictor.predict(datetime.date(2011, 1, 14))
+        fit_args = mocked_model.partial_fit.call_args[0]
+        self.assertEqual(predictor.scaler.inverse_transform(fit_args[0]).round().tolist(), [[11]])
+        self.assertEqual(fit_args[1].tolist(), [False])
+        self.assertEqual(predictor.scaler.inverse_transform(mocked_model.predict.call_args[0][0]).round().tolist(),
+                         [[13]])
+
+
+    def test_default_incremental_model(self):
+        # The default model shall train incrementally with whatever scikit-learn is installed
+        date_sequence = pd.date_range('1/1/2011', periods=15, freq='D')
+        time_series = pd.DataFrame({
+            'Violent Crime Committed?': [True, False]*7 + [True],
+            'Other Data': list(range(15))
+        }, index=date_sequence)
+        predictor = NonsequentialPredictor(time_series, incremental=True)
+        predictions = predictor.predict_many([datetime.date(2011, 1, 13), datetime.date(2011, 1, 14)])
+        self.assertEqual(len(predictions), 2)
+        self.assertTrue(hasattr(predictor.model, 'predict_proba'))
+
+
+    def test_incremental_accuracy_tracks_batch(self):
+        # On a realistic series, walking forward shall score about as well as refitting on the whole history,
+        #   and no better than it could without seeing the outcomes it's scored on
+        directory = tempfile.mkdtemp()
+        try:
+            csv_path = os.path.join(directory, 'crimes.csv')
+            synthetic.write_crimes_csv(csv_path, 1000, areas=[77], start=datetime.date(2009, 1, 1),
+                                       end=datetime.date(2011, 1, 1), random_state=0)
+            time_series = NonsequentialPredictor.preprocess(munge.make_master_dict(csv_path))['Edgewater']
+        finally:
+            shutil.rmtree(directory)
+        days = list(pd.date_range('2010-07-01', '2010-12-30'))
+        actual = time_series['Violent Crime Committed?'].reindex(days).values.astype(bool)
+
+        batch_accuracy = (NonsequentialPredictor(time_series, retrain_interval=30).predict_many(days) == actual).mean()
+        incremental_accuracy = (NonsequentialPredictor(time_series, incremental=True).predict_many(days) ==
+                                actual).mean()
+        majority_accuracy = max(actual.mean(), 1 - actual.mean())
+        self.assertLess(abs(incremental_accuracy - batch_accuracy), 0.05)
+        self.assertLess(incremental_accuracy, majority_accuracy + 0.05)
+
+
+    def test_retrain_interval(self):
+        mocked_model = BaseEstimator()
+        mocked_model.fit = MagicMock()
+        mocked_model.predict = MagicMock(side_effect=lambda features: [True]*len(features))
+
+        date_sequence = pd.date_range('1/1/2011', periods=15, freq='D')
+        time_series = pd.DataFrame({
+            'Violent Crime Committed?': [True, False]*7 + [True],
+            'Other Data': list(range(15))
+        }, index=date_sequence)
+        predictor = NonsequentialPredictor(time_series, model=mocked_model, retrain_interval=3)
+
+        days = list(pd.date_range('1/5/2011', periods=7, freq='D'))
+        self.assertEqual(predictor.predict_many(days).tolist(), [True]*7)
+
+        # Seven days retrained every three days means three fits...
+        self.assertEqual(mocked_model.fit.call_count, 3)
+        # and the last fit is on every day up to the last group's first day, January 11
+        fit_args = mocked_model.fit.call_args[0]
+        self.assertEqual(fit_args[0].tolist(), [[num] for num in range(10)])
+        # Every group's days are predicted together from their own features
+        self.assertEqual(mocked_model.predict.call_args[0][0].tolist(), [[10]])
+
+
+class PositionTests(unittest.TestCase):
+    def setUp(self):
+        self.index = pd.date_range('1/1/2011', periods=40, freq='D')
+        self.days = pd.to_datetime(['12/1/2010', '1/1/2011', '1/15/2011', '2/9/2011', '3/1/2011'])
+
+    def test_contiguous_positions(self):
+        # Arithmetic on a gapless index shall give the same positions as searching it
+        for side in ['left', 'right']:
+            self.assertEqual(predict.get_day_positions(self.index, self.days, side=side).tolist(),
+                             self.index.searchsorted(self.days, side=side).tolist())
+        self.assertEqual(predict.get_day_positions(self.index, self.days, offset=-30).tolist(),
+                         self.index.searchsorted(self.days - datetime.timedelta(days=30)).tolist())
+
+    def test_positions_with_gaps(self):
+        index_with_gaps = self.index.delete([3, 20])
+        self.assertFalse(predict.is_contiguous(index_with_gaps))
+        self.assertEqual(predict.get_day_positions(index_with_gaps, self.days).tolist(),
+                         index_with_gaps.searchsorted(self.days).tolist())
+
+    def test_contiguous_without_frequency(self):
+        # An index that doesn't know its frequency shall still be recognized as gapless, or not
+        self.assertTrue(predict.is_contiguous(pd.DatetimeIndex(list(self.index))))
+        self.assertFalse(predict.is_contiguous(pd.DatetimeIndex(list(self.index + datetime.timedelta(hours=1)))))
+        self.assertFalse(predict.is_contiguous(pd.date_range('1/1/2011', periods=40, freq='2D')))
+
+    def test_previous_month_is_view(self):
+        time_series = pd.DataFrame({'Violent Crime Committed?': np.arange(40)}, index=self.index)
+        previous_month = predict.get_previous_month(time_series, self.index[35])
+        self.assertEqual(previous_month['Violent Crime Committed?'].tolist(), list(range(5, 35)))
+        # The window shall share its data with the time series instead of copying it
+        self.assertTrue(np.may_share_memory(previous_month['Violent Crime Committed?'].values,
+                                         time_series['Violent Crime Committed?'].values))
+
+
 class PreprocessTests(unittest.TestCase):
     def test_baseline_preprocess(self):
         test_dict = {
@@ -147,7 +467,7 @@ class PreprocessTests(unittest.TestCase):
         test_dict = {
             # The Violent Crime Committed? column should be converted to ints
             'Edgewater': pd.DataFrame({'Violent Crime Committed?': [True, False]}),
-            # preprocess() deletes a Chicago key. It's allowed to expect it, so we'll add it here.
+            # preprocess() drops a Chicago key. It's allowed to expect it, so we'll add it here.
             'Chicago': None
         }
         processed_dict = SequentialPredictor.preprocess(test_dict)
@@ -155,6 +475,16 @@ class PreprocessTests(unittest.TestCase):
         # [True, False] should become [1, 0]
         self.assertEqual(list(processed_column), [1, 0])
 
+    def test_preprocess_leaves_input_alone(self):
+        edgewater = pd.DataFrame({'Violent Crime Committed?': [True, False], 'Irrelevant': ['right', 'meow']})
+        test_dict = {'Edgewater': edgewater, 'Chicago': None}
+        for predictor in [BaselinePredictor, SequentialPredictor]:
+            predictor.preprocess(test_dict)
+            # Every key and column shall still be there, with the same values
+            self.assertEqual(set(test_dict.keys()), {'Edgewater', 'Chicago'})
+            self.assertEqual(list(edgewater['Violent Crime Committed?']), [True, False])
+            self.assertIn('Irrelevant', edgewater)
+
 
 class NonsequentialPreprocessTests(unittest.TestCase):
     def setUp(self):
@@ -196,6 +526,17 @@ class NonsequentialPreprocessTests(unittest.TestCase):
             # and in the city at large.
             self.assertIn('Chicago ' + name, time_series)
 
+    def test_window_sums(self):
+        # Trailing sums shall match a sum over each window, for any set of windows
+        days = pd.DataFrame({label + ' Crimes': np.arange(40.0) * (number + 1)
+                             for number, label in enumerate(['Violent', 'Severe', 'Minor', 'Petty'])})
+        with_windows = NonsequentialPredictor.extract_windows(days, windows=(3, 7, 12))
+        self.assertEqual(len(with_windows), 28)
+        for day in [12, 25, 39]:
+            self.assertEqual(with_windows['Violent Crimes in Last 3 Days'][day], sum(range(day - 2, day + 1)))
+            self.assertEqual(with_windows['Minor Crimes in Last Week'][day], 3 * sum(range(day - 6, day + 1)))
+            self.assertEqual(with_windows['Petty Crimes in Last 12 Days'][day], 4 * sum(range(day - 11, day + 1)))
+
     def test_row_values(self):
         # Because the window function requires 30 days of history,
         # our 31 day dataframe should have just one day after processing
@@ -0,0 +1,133 @@
+"""
+Progress events for long evaluations.
+
+A ProgressTracker is told each time a (predictor, community area) unit of work finishes
+and sends an event to every sink it was given. A sink is any function taking an event dict.
+Events have these keys:
+    'event': 'start', 'area_done' or 'finish'
+    'time': when the event happened, as an ISO 8601 string
+    'elapsed_seconds': seconds since the start
+    'units_done' and 'units_total': (predictor, area) pairs evaluated so far and overall
+    'eta_seconds': estimated seconds left, or None before the first unit is done
+and 'area_done' events also have:
+    'predictor' and 'area': the unit that finished
+    'predictions': number of days predicted for it
+    'unit_seconds': seconds since the previous unit finished
+    'predictor_areas_done' and 'predictor_areas_total': areas evaluated so far and overall for this predictor
+    'predictions_per_second': throughput of this predictor so far
+"""
+import datetime
+import json
+import sys
+import time
+
+
+class ProgressTracker():
+
+    def __init__(self, areas_by_predictor, sinks=None):
+        """
+        :param areas_by_predictor: dict mapping each predictor's name to how many areas it will evaluate
+        :param sinks: list of functions to send events to
+        """
+        self.sinks = list(sinks or [])
+        self.areas_total = dict(areas_by_predictor)
+        self.areas_done = {predictor: 0 for predictor in areas_by_predictor}
+        self.predictions = {predictor: 0 for predictor in areas_by_predictor}
+        self.seconds = {predictor: 0.0 for predictor in areas_by_predictor}
+        self.units_total = sum(areas_by_predictor.values())
+        self.units_done = 0
+        self.started = None
+        self.last_unit_finished = None
+
+    def start(self):
+        self.started = self.last_unit_finished = time.perf_counter()
+        self.emit({'event': 'start'})
+
+    def area_done(self, predictor, area, num_predictions):
+        now = time.perf_counter()
+        unit_seconds = now - self.last_unit_finished
+        self.last_unit_finished = now
+
+        self.units_done += 1
+        self.areas_done[predictor] += 1
+        self.predictions[predictor] += num_predictions
+        self.seconds[predictor] += unit_seconds
+        self.emit({
+            'event': 'area_done',
+            'predictor': predictor,
+            'area': area,
+            'predictions': num_predictions,
+            'unit_seconds': unit_seconds,
+            'predictor_areas_done': self.areas_done[predictor],
+            'predictor_areas_total': self.areas_total[predictor],
+            'predictions_per_second': self.predictions[predictor] / self.seconds[predictor]
+                if self.seconds[predictor] > 0 else None
+        })
+
+    def finish(self):
+        self.emit({'event': 'finish'})
+
+    def emit(self, event):
+        if not self.sinks:
+            return
+        elapsed_seconds = time.perf_counter() - self.started
+        event['time'] = datetime.datetime.now().isoformat()
+        event['elapsed_seconds'] = elapsed_seconds
+        event['units_done'] = self.units_done
+        event['units_total'] = self.units_total
+        # Assume the remaining units take as long as the ones so far, on average
+        event['eta_seconds'] = elapsed_seconds / self.units_done * (self.units_total - self.units_done) \
+            if self.units_done else None
+        for sink in self.sinks:
+            sink(event)
+
+
+class StderrSink():
+    """
+    Writes a line per event to stderr (or any other file)
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def __call__(self, event):
+        stream = self.stream or sys.stderr
+        stream.write(format_event(event) + '\n')
+        stream.flush()
+
+
+class JsonLinesSink():
+    """
+    Appends each event to the file at path as a line of json
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, 'a') as events_file:
+            events_file.write(json.dumps(event) + '\n')
+
+
+def format_event(event):
+    progress = '[{units_done}/{units_total}]'.format(**event)
+    eta = 'ETA {:.0f}s'.format(event['eta_seconds']) if event['eta_seconds'] is not None else 'ETA unknown'
+    if event['event'] != 'area_done':
+        return '{} {} after {:.1f}s, {}'.format(progress, event['event'], event['elapsed_seconds'], eta)
+
+    rate = event['predictions_per_second']
+    return '{} {} {} ({}/{} areas): {} predictions in {:.2f}s, {} predictions/s, {}'.format(
+        progress, event['predictor'], event['area'], event['predictor_areas_done'], event['predictor_areas_total'],
+        event['predictions'], event['unit_seconds'], '{:.1f}'.format(rate) if rate is not None else '?', eta)
+
+
+def make_sinks(progress):
+    """
+    :param progress: None, a sink, or a list of sinks
+    :return: list of sinks
+    """
+    if progress is None:
+        return []
+    if callable(progress):
+        return [progress]
+    return list(progress)
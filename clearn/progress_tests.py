@@ -0,0 +1,50 @@
+from clearn import progress
+import io
+import json
+import os
+import tempfile
+import unittest
+
+
+class TestProgressTracker(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.tracker = progress.ProgressTracker({'BaselinePredictor': 2, 'SequentialPredictor': 1},
+                                                [self.events.append])
+
+    def test_events(self):
+        self.tracker.start()
+        self.tracker.area_done('BaselinePredictor', 'Edgewater', 30)
+        self.tracker.area_done('SequentialPredictor', 'Edgewater', 30)
+        self.tracker.finish()
+
+        self.assertEqual([event['event'] for event in self.events], ['start', 'area_done', 'area_done', 'finish'])
+        # Nothing's done at the start, so there's no estimate yet
+        self.assertIsNone(self.events[0]['eta_seconds'])
+
+        area_done = self.events[1]
+        self.assertEqual(area_done['predictor'], 'BaselinePredictor')
+        self.assertEqual(area_done['area'], 'Edgewater')
+        self.assertEqual((area_done['units_done'], area_done['units_total']), (1, 3))
+        self.assertEqual((area_done['predictor_areas_done'], area_done['predictor_areas_total']), (1, 2))
+        self.assertGreaterEqual(area_done['eta_seconds'], 0)
+
+    def test_stderr_sink(self):
+        stream = io.StringIO()
+        tracker = progress.ProgressTracker({'BaselinePredictor': 1}, [progress.StderrSink(stream)])
+        tracker.start()
+        tracker.area_done('BaselinePredictor', 'Edgewater', 30)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('BaselinePredictor Edgewater (1/1 areas): 30 predictions', lines[1])
+
+    def test_json_lines_sink(self):
+        descriptor, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(descriptor)
+        tracker = progress.ProgressTracker({'BaselinePredictor': 1}, [progress.JsonLinesSink(path)])
+        tracker.start()
+        tracker.area_done('BaselinePredictor', 'Edgewater', 30)
+        with open(path) as events_file:
+            events = [json.loads(line) for line in events_file]
+        os.remove(path)
+        self.assertEqual([event['event'] for event in events], ['start', 'area_done'])
@@ -0,0 +1,207 @@
+"""
+Columnar on-disk format for master_dict (as defined in munge.py).
+
+Every column of the time series is saved as one contiguous numpy array with a row for each area
+and a column for each day. A small json header records the first day, number of days, area names and columns.
+The arrays are memory-mapped when a store is opened,
+so only the areas and columns that are actually used get read from disk.
+
+The header also keeps a revision number that goes up whenever a write changes days that were already stored.
+Appending new days leaves it alone, so (start, revision) identifies the data for every stored day.
+"""
+from collections.abc import MutableMapping
+import copy
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+META_FILE = 'meta.json'
+
+
+def write_store(master_dict, path):
+    """
+    Saves master_dict to the directory at path, replacing any store already there.
+
+    Arrays are written to new files and the header is swapped in last,
+    so a store that is open (memory-mapped) elsewhere keeps seeing the old data.
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    old_meta = read_meta(path)
+    generation = 0 if old_meta is None else old_meta['generation'] + 1
+
+    chicago_frame = master_dict['Chicago']
+    areas = sorted(area for area in master_dict if area != 'Chicago') + ['Chicago']
+    area_columns = list(master_dict[areas[0]].columns) if len(areas) > 1 else []
+    chicago_columns = list(chicago_frame.columns)
+    columns = area_columns + [column for column in chicago_columns if column not in area_columns]
+
+    # Stays the same unless this write changes days that were already stored
+    revision = 0 if old_meta is None else old_meta.get('revision', 0)
+    rewrites_old_days = old_meta is not None and (
+        old_meta['start'] != str(chicago_frame.index[0].date()) or old_meta['areas'] != areas or
+        old_meta['num_days'] > len(chicago_frame) or set(old_meta['files']) != set(columns))
+
+    files = {}
+    categorical_columns = []
+    for number, column in enumerate(columns):
+        frames_with_column = [master_dict[area] for area in areas if column in master_dict[area]]
+        if is_categorical(frames_with_column[0][column]):
+            # Categorical columns (like Month and Weekday) hold small integers
+            categorical_columns.append(column)
+            dtype = np.int16
+        else:
+            dtype = frames_with_column[0][column].dtype
+
+        filename = 'column_{}.{}.npy'.format(number, generation)
+        array = np.lib.format.open_memmap(os.path.join(path, filename), mode='w+',
+                                          dtype=dtype, shape=(len(areas), len(chicago_frame)))
+        for row, area in enumerate(areas):
+            if column in master_dict[area]:
+                array[row] = np.asarray(master_dict[area][column])
+        array.flush()
+        if old_meta is not None and not rewrites_old_days:
+            old_array = np.load(os.path.join(path, old_meta['files'][column]), mmap_mode='r')
+            rewrites_old_days = not np.array_equal(old_array, array[:, :old_array.shape[1]])
+            del old_array
+        del array
+        files[column] = filename
+
+    meta = {
+        'generation': generation,
+        'revision': revision + 1 if rewrites_old_days else revision,
+        'start': str(chicago_frame.index[0].date()),
+        'num_days': len(chicago_frame),
+        'areas': areas,
+        'area_columns': area_columns,
+        'chicago_columns': chicago_columns,
+        'categorical_columns': categorical_columns,
+        'files': files
+    }
+    temp_meta_path = os.path.join(path, META_FILE + '.tmp')
+    with open(temp_meta_path, 'w') as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(temp_meta_path, os.path.join(path, META_FILE))
+
+    if old_meta is not None:
+        remove_stale_files(path, old_meta, meta)
+
+
+def open_store(path):
+    """
+    Returns a StoredMasterDict backed by the store at path, or None if there is no store there.
+    """
+    meta = read_meta(path)
+    if meta is None:
+        return None
+    arrays = {column: np.load(os.path.join(path, filename), mmap_mode='r')
+              for column, filename in meta['files'].items()}
+    return StoredMasterDict(meta, arrays)
+
+
+def read_meta(path):
+    try:
+        with open(os.path.join(path, META_FILE), 'r') as meta_file:
+            return json.load(meta_file)
+    except IOError:
+        return None
+
+
+def remove_stale_files(path, old_meta, meta):
+    current_files = set(meta['files'].values())
+    for filename in old_meta['files'].values():
+        if filename in current_files:
+            continue
+        try:
+            os.remove(os.path.join(path, filename))
+        except OSError:
+            # Some platforms won't remove files that are still memory-mapped. They'll be replaced next time.
+            pass
+
+
+def is_categorical(series):
+    return str(series.dtype) == 'category'
+
+
+def get_data_version(master_dict):
+    """
+    :return: string identifying the data in master_dict.
+        For a StoredMasterDict it only changes when days that were already stored are rewritten,
+        not when new days are appended. Any other dict is identified by a hash of all of its data.
+    """
+    if isinstance(master_dict, StoredMasterDict):
+        return 'store:{}:{}'.format(master_dict.meta['start'], master_dict.meta.get('revision', 0))
+
+    digest = hashlib.sha1()
+    for area in sorted(master_dict):
+        frame = master_dict[area]
+        digest.update(area.encode('utf-8'))
+        digest.update(str(frame.index[0]).encode('utf-8'))
+        for column in sorted(frame.columns):
+            values = frame[column].cat.codes.values if is_categorical(frame[column]) else frame[column].values
+            digest.update(column.encode('utf-8'))
+            digest.update(np.ascontiguousarray(values).tobytes())
+    return 'hash:' + digest.hexdigest()
+
+
+class StoredMasterDict(MutableMapping):
+    """
+    Dict-like view of a store mapping area names to pandas data frames.
+    Each area's frame is built from the memory-mapped arrays the first time it is looked up.
+
+    Setting or deleting keys only changes this view, never the store on disk.
+    """
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+        self.index = pd.date_range(meta['start'], periods=meta['num_days'])
+        self.rows = {area: row for row, area in enumerate(meta['areas'])}
+        self.keys_in_order = list(meta['areas'])
+        self.frames = {}
+
+    def __getitem__(self, area):
+        if area not in self.frames:
+            if area not in self.rows or area not in self.keys_in_order:
+                raise KeyError(area)
+            self.frames[area] = self.make_frame(area)
+        return self.frames[area]
+
+    def __setitem__(self, area, frame):
+        if area not in self.keys_in_order:
+            self.keys_in_order.append(area)
+        self.frames[area] = frame
+
+    def __delitem__(self, area):
+        if area not in self.keys_in_order:
+            raise KeyError(area)
+        self.keys_in_order.remove(area)
+        self.frames.pop(area, None)
+
+    def __iter__(self):
+        return iter(list(self.keys_in_order))
+
+    def __len__(self):
+        return len(self.keys_in_order)
+
+    def __deepcopy__(self, memo):
+        # The arrays are read-only, so copies can share them
+        duplicate = StoredMasterDict(self.meta, self.arrays)
+        duplicate.keys_in_order = list(self.keys_in_order)
+        duplicate.frames = copy.deepcopy(self.frames, memo)
+        return duplicate
+
+    def make_frame(self, area):
+        row = self.rows[area]
+        columns = self.meta['chicago_columns'] if area == 'Chicago' else self.meta['area_columns']
+        frame = pd.DataFrame(index=self.index)
+        for column in columns:
+            values = self.arrays[column][row]
+            if column in self.meta['categorical_columns']:
+                frame[column] = pd.Series(values, index=self.index).astype(np.int64).astype('category')
+            else:
+                frame[column] = values
+        return frame
@@ -0,0 +1,87 @@
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from clearn import store
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range('1/1/2001', periods=10, freq='D')
+        edgewater = pd.DataFrame({
+            'Violent Crimes': [float(num) for num in range(10)],
+            'Violent Crime Committed?': [num > 0 for num in range(10)],
+            'Month': [1]*10
+        }, index=index)
+        edgewater['Month'] = edgewater['Month'].astype('category')
+        chicago = pd.DataFrame({'Violent Crimes': [2.0]*10}, index=index)
+        self.master_dict = {'Edgewater': edgewater, 'Chicago': chicago}
+
+        self.path = tempfile.mkdtemp()
+        store.write_store(self.master_dict, self.path)
+        self.stored = store.open_store(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_missing_store(self):
+        self.assertIsNone(store.open_store(os.path.join(self.path, 'nothing here')))
+
+    def test_keys(self):
+        self.assertEqual(set(self.master_dict.keys()), set(self.stored.keys()))
+
+    def test_round_trip(self):
+        # Every frame shall come back with the same index, columns and values it was saved with
+        for area, frame in self.master_dict.items():
+            stored_frame = self.stored[area]
+            self.assertEqual(set(frame.columns), set(stored_frame.columns), 'Failed on ' + area)
+            self.assertTrue((frame.index == stored_frame.index).all(), 'Failed on ' + area)
+            for column in frame.columns:
+                self.assertEqual(list(frame[column]), list(stored_frame[column]), 'Failed on ' + column)
+
+    def test_categorical_columns(self):
+        self.assertEqual(self.stored['Edgewater']['Month'].dtype, 'category')
+
+    def test_overwrite(self):
+        # Rewriting the store shall not disturb a store that is already open
+        self.master_dict['Chicago']['Violent Crimes'] = 3.0
+        store.write_store(self.master_dict, self.path)
+        self.assertEqual(list(self.stored['Chicago']['Violent Crimes']), [2.0]*10)
+        self.assertEqual(list(store.open_store(self.path)['Chicago']['Violent Crimes']), [3.0]*10)
+
+    def test_deepcopy_and_delete(self):
+        # Deleting a key from a copy shall leave the original intact
+        duplicate = copy.deepcopy(self.stored)
+        del duplicate['Chicago']
+        self.assertNotIn('Chicago', duplicate)
+        self.assertIn('Chicago', self.stored)
+
+    def test_revision(self):
+        self.assertEqual(self.stored.meta['revision'], 0)
+
+        # Appending a day shall keep the revision...
+        index = pd.date_range('1/1/2001', periods=11, freq='D')
+        self.master_dict = {area: frame.reindex(index) for area, frame in self.master_dict.items()}
+        self.master_dict['Edgewater']['Violent Crime Committed?'] = [num > 0 for num in range(11)]
+        self.master_dict['Edgewater']['Violent Crimes'] = [float(num) for num in range(11)]
+        self.master_dict['Edgewater']['Month'] = pd.Series([1]*11, index=index).astype('category')
+        self.master_dict['Chicago']['Violent Crimes'] = 2.0
+        store.write_store(self.master_dict, self.path)
+        appended = store.open_store(self.path)
+        self.assertEqual(appended.meta['revision'], 0)
+        self.assertEqual(store.get_data_version(appended), store.get_data_version(self.stored))
+
+        # but rewriting a day that was already stored shall bump it.
+        self.master_dict['Chicago']['Violent Crimes'] = 3.0
+        store.write_store(self.master_dict, self.path)
+        rewritten = store.open_store(self.path)
+        self.assertEqual(rewritten.meta['revision'], 1)
+        self.assertNotEqual(store.get_data_version(rewritten), store.get_data_version(self.stored))
+
+    def test_data_version_of_plain_dict(self):
+        version = store.get_data_version(self.master_dict)
+        self.assertEqual(version, store.get_data_version(copy.deepcopy(self.master_dict)))
+        self.master_dict['Chicago']['Violent Crimes'] = 3.0
+        self.assertNotEqual(version, store.get_data_version(self.master_dict))
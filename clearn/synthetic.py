@@ -0,0 +1,82 @@
+"""
+Generator of fake crime records in the format of the city data portal's export (see munge.py),
+for benchmarks and tests that need more data than the fixtures hold.
+"""
+import csv
+from datetime import date
+import numpy as np
+import pandas as pd
+from clearn import clearn_path
+from clearn import munge
+
+# Every column of the portal's export, in order
+PORTAL_COLUMNS = ['ID', 'Case Number', 'Date', 'Block', 'IUCR', 'Primary Type', 'Description',
+                  'Location Description', 'Arrest', 'Domestic', 'Beat', 'District', 'Ward', 'Community Area',
+                  'FBI Code', 'X Coordinate', 'Y Coordinate', 'Year', 'Updated On', 'Latitude', 'Longitude',
+                  'Location']
+
+# Rows are generated and written this many at a time, so memory stays flat for any number of rows
+ROWS_PER_CHUNK = 100000
+
+
+def write_crimes_csv(path, num_rows, areas=None, start=date(2001, 1, 1), end=date(2015, 3, 1), crime_mix=None,
+                     missing_area_rate=0.001, arrest_rate=0.25, domestic_rate=0.15, random_state=None):
+    """
+    Writes num_rows fake crimes to a csv at path, newest first like the portal's export.
+
+    :param areas: list of community area numbers crimes happen in (all 77 by default)
+    :param start: date of the earliest possible crime
+    :param end: date of the latest possible crime
+    :param crime_mix: dict mapping primary types (as in config/crime_bins.csv) to relative frequencies.
+        By default every primary type is equally likely.
+    :param missing_area_rate: fraction of crimes without a community area, like some of the real records
+    :param random_state: seed, for the same file every time
+    """
+    if areas is None:
+        areas = list(range(1, len(munge.get_community_area_names()) + 1))
+    if crime_mix is None:
+        crime_mix = {primary_type: 1.0 for primary_type in get_primary_types()}
+    primary_types = sorted(crime_mix)
+    weights = np.array([crime_mix[primary_type] for primary_type in primary_types], dtype=np.float64)
+    weights /= weights.sum()
+
+    random = np.random.RandomState(random_state)
+    first_second = pd.Timestamp(start).value // 10**9
+    span = (pd.Timestamp(end).value // 10**9) - first_second + 24*60*60
+
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(PORTAL_COLUMNS)
+        for chunk_start in range(0, num_rows, ROWS_PER_CHUNK):
+            chunk_end = min(chunk_start + ROWS_PER_CHUNK, num_rows)
+            # Each chunk covers a slice of the time span, newest chunk first, so the file is sorted by date
+            newest = span * (1 - chunk_start / num_rows)
+            oldest = span * (1 - chunk_end / num_rows)
+            seconds = first_second + np.sort(random.uniform(oldest, newest, chunk_end - chunk_start))[::-1]
+            writer.writerows(make_rows(random, chunk_start, seconds, areas, primary_types, weights,
+                                       missing_area_rate, arrest_rate, domestic_rate))
+
+
+def make_rows(random, first_id, seconds, areas, primary_types, weights, missing_area_rate, arrest_rate,
+              domestic_rate):
+    num_rows = len(seconds)
+    timestamps = pd.to_datetime(seconds.astype(np.int64), unit='s')
+    dates = [timestamp.strftime(munge.TIMESTAMP_FORMAT) for timestamp in timestamps]
+    crime_types = np.array(primary_types)[random.choice(len(primary_types), num_rows, p=weights)]
+    community_areas = np.array(areas)[random.randint(0, len(areas), num_rows)].astype(str)
+    community_areas[random.uniform(size=num_rows) < missing_area_rate] = ''
+    arrests = np.where(random.uniform(size=num_rows) < arrest_rate, 'true', 'false')
+    domestics = np.where(random.uniform(size=num_rows) < domestic_rate, 'true', 'false')
+
+    for row in range(num_rows):
+        year = dates[row][6:10]
+        yield [first_id + row, 'HX{:06d}'.format(first_id + row), dates[row], '000XX N STATE ST', '0000',
+               crime_types[row], 'SYNTHETIC', 'STREET', arrests[row], domestics[row], '0111', '001', '1',
+               community_areas[row], '00', '', '', year, dates[row], '', '', '']
+
+
+def get_primary_types():
+    """
+    :return: sorted list of every primary type in config/crime_bins.csv
+    """
+    return sorted(munge.read_translation_csv(clearn_path('config/crime_bins.csv')))
@@ -0,0 +1,51 @@
+from clearn import munge
+from clearn import synthetic
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestWriteCrimesCsv(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'crimes.csv')
+        synthetic.write_crimes_csv(self.path, 2000, areas=[14, 77], start=datetime.date(2010, 1, 1),
+                                   end=datetime.date(2010, 3, 1), crime_mix={'BATTERY': 3, 'THEFT': 1},
+                                   missing_area_rate=0, random_state=0)
+        with open(self.path) as csv_file:
+            self.rows = list(csv.DictReader(csv_file))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_portal_format(self):
+        self.assertEqual(len(self.rows), 2000)
+        self.assertEqual(list(self.rows[0].keys()), synthetic.PORTAL_COLUMNS)
+
+    def test_settings(self):
+        self.assertEqual({row['Community Area'] for row in self.rows}, {'14', '77'})
+        self.assertEqual({row['Primary Type'] for row in self.rows}, {'BATTERY', 'THEFT'})
+        days = [datetime.datetime.strptime(row['Date'], munge.TIMESTAMP_FORMAT) for row in self.rows]
+        # Newest first, within the requested dates
+        self.assertEqual(days, sorted(days, reverse=True))
+        self.assertGreaterEqual(min(days), datetime.datetime(2010, 1, 1))
+        self.assertLess(max(days), datetime.datetime(2010, 3, 2))
+
+    def test_same_seed_same_file(self):
+        other_path = os.path.join(self.directory, 'other.csv')
+        synthetic.write_crimes_csv(other_path, 2000, areas=[14, 77], start=datetime.date(2010, 1, 1),
+                                   end=datetime.date(2010, 3, 1), crime_mix={'BATTERY': 3, 'THEFT': 1},
+                                   missing_area_rate=0, random_state=0)
+        with open(self.path) as csv_file, open(other_path) as other_file:
+            self.assertEqual(csv_file.read(), other_file.read())
+
+    def test_munges(self):
+        # Every generated crime shall be counted in the master dict
+        master_dict = munge.make_master_dict(self.path)
+        self.assertEqual(master_dict['Chicago']['Violent Crimes'].sum(),
+                         sum(1 for row in self.rows if row['Primary Type'] == 'BATTERY'))
+        self.assertEqual(master_dict['Chicago']['Severe Crimes'].sum(),
+                         sum(1 for row in self.rows if row['Primary Type'] == 'THEFT'))